@@ -0,0 +1,73 @@
+## === bench_clean_data === ##
+# Micro-benchmark: legacy clean_data (astype(str) over every object column) vs the
+# column-typed clean_data in csv_to_db, on synthetic wide Trackman frames
+# Reports time, peak allocation during cleaning (tracemalloc) and cleaned frame size
+# tracemalloc sees Python objects and NumPy buffers, not Arrow-backed string buffers
+
+import argparse
+import io
+import time
+import tracemalloc
+import pandas as pd
+import trackman_schema
+from csv_to_db import clean_data, parse_time
+from generate_trackman_data import game_csv
+
+def legacy_clean_data(df):
+    # clean_data before the column-typed rewrite
+    df.rename(columns={'Top/Bottom': 'Top_Bottom'}, inplace=True)
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Time'] = parse_time(df['Time'])
+    df['RowID'] = df['GameID'] + '_' + df['PitchNo'].astype(str)
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            df[col] = df[col].astype(str)
+    return df
+
+def legacy_frame(text):
+    # Inferred read as the uploader used to do it; text columns are object dtype as on pandas < 3
+    df = pd.read_csv(io.StringIO(text))
+    return df.astype({col: object for col in df.columns if pd.api.types.is_string_dtype(df[col])}).copy()
+
+def typed_frame(text):
+    header = text.split("\n", 1)[0].split(",")
+    return pd.read_csv(io.StringIO(text), dtype=trackman_schema.read_dtypes(header))
+
+def measure(clean, make_frame, text, repeat):
+    # Best wall time over `repeat` runs, then one traced run for peak allocation
+    best = float('inf')
+    for _ in range(repeat):
+        df = make_frame(text)
+        start = time.perf_counter()
+        clean(df)
+        best = min(best, time.perf_counter() - start)
+
+    df = make_frame(text)
+    tracemalloc.start()
+    cleaned = clean(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, cleaned.memory_usage(deep=True).sum()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_data on synthetic wide Trackman frames")
+    parser.add_argument("--rows", type=int, default=5000, help="Rows per frame (default: 5000)")
+    parser.add_argument("--columns", type=int, default=170, help="Columns per frame (default: 170)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per variant, best time is reported")
+    args = parser.parse_args()
+
+    text = game_csv(args.rows, args.columns)
+    print(f"Cleaning a {args.rows} x {args.columns} Trackman frame, best of {args.repeat}")
+    results = {
+        "legacy": measure(legacy_clean_data, legacy_frame, text, args.repeat),
+        "column-typed": measure(clean_data, typed_frame, text, args.repeat),
+    }
+    for name, (seconds, peak, size) in results.items():
+        print(f"{name:>13}: {seconds * 1000:8.1f} ms | peak alloc {peak / 1024 / 1024:7.2f}MB | "
+              f"cleaned frame {size / 1024 / 1024:7.2f}MB")
+    legacy, typed = results["legacy"], results["column-typed"]
+    print(f"{'reduction':>13}: {legacy[0] / typed[0]:.1f}x time, {legacy[1] / typed[1]:.1f}x peak alloc, "
+          f"{legacy[2] / typed[2]:.1f}x frame size")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+## === bench_downloader === ##
+# Downloader benchmark against a local FTPS stand-in for Trackman's server (pyftpdlib), seeded
+# with generate_trackman_data, with injectable latency (per control command round trip) and
+# bandwidth (per data connection) limits
+# Measures files/sec and MB/sec for the serial, pooled (--workers) and async (--concurrency) engines
+# --serve just runs the seeded server, e.g. for trying ftp_csv_downloader.py by hand
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+import generate_trackman_data
+import ftp_csv_downloader
+
+USER = "bench"
+PASSWORD = "bench"
+
+def write_self_signed_cert(path):
+    # Throwaway certificate and key in one PEM file for the local server
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(datetime.now() - timedelta(days=1))
+            .not_valid_after(datetime.now() + timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    with open(path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                  serialization.NoEncryption()))
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+
+def start_server(root_dir, certfile, latency_ms=0, bandwidth_kbps=0):
+    # Threaded pyftpdlib FTPS server on a free localhost port, returns (server, port)
+    # Each connection has its own thread, so the injected latency only stalls that session
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import TLS_FTPHandler, TLS_DTPHandler
+    from pyftpdlib.log import config_logging
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    class ThrottledTLS_DTPHandler(TLS_DTPHandler):
+        # Paces each data connection from its first byte: after every chunk it sleeps until the
+        # bytes sent match the limit, so files smaller than a second's worth are slowed too
+        # (pyftpdlib's ThrottledDTPHandler only starts once a second's worth has gone through
+        # one connection, and every file has its own)
+        write_limit = bandwidth_kbps * 1024
+        first_send = None
+        bytes_sent = 0
+
+        def send(self, data):
+            if self.first_send is None:
+                self.first_send = time.perf_counter()
+            sent = super().send(data)
+            self.bytes_sent += sent
+            ahead = self.bytes_sent / self.write_limit - (time.perf_counter() - self.first_send)
+            if ahead > 0:
+                time.sleep(ahead)
+            return sent
+
+    class SlowTLS_FTPHandler(TLS_FTPHandler):
+        def process_command(self, cmd, *args, **kwargs):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            super().process_command(cmd, *args, **kwargs)
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_user(USER, PASSWORD, root_dir, perm="elr")
+    SlowTLS_FTPHandler.authorizer = authorizer
+    SlowTLS_FTPHandler.certfile = certfile
+    SlowTLS_FTPHandler.dtp_handler = ThrottledTLS_DTPHandler if bandwidth_kbps else TLS_DTPHandler
+    SlowTLS_FTPHandler.banner = "bench_downloader"
+    # pyftpdlib logs every login and transfer at INFO unless logging is already set up
+    config_logging(level=logging.WARNING)
+    server = ThreadedFTPServer(("127.0.0.1", 0), SlowTLS_FTPHandler)
+    threading.Thread(target=server.serve_forever, kwargs={"handle_exit": False}, daemon=True).start()
+    return server, server.address[1]
+
+def run_strategy(strategy, days, local_dir, workers, concurrency):
+    # One download of every day into an empty local_dir, returns (seconds, files, bytes)
+    ftp_csv_downloader.LOCAL_BASE_DIR = local_dir
+    ftp_csv_downloader.LEDGER_PATH = os.path.join(local_dir, "ingest_ledger.sqlite")
+    os.makedirs(local_dir)
+    remote_dirs = [ftp_csv_downloader.get_remote_dir(day) for day in days]
+
+    # The downloader prints a line per file, which would dominate small-file timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if strategy == "async":
+            asyncio.run(ftp_csv_downloader.sync_days_async(days, concurrency))
+        else:
+            ftp = ftp_csv_downloader.connect_ftp_tls()
+            try:
+                for remote_dir in remote_dirs:
+                    ftp_csv_downloader.sync_day(ftp, remote_dir, workers if strategy == "pooled" else 1)
+            finally:
+                ftp.quit()
+        elapsed = time.perf_counter() - start
+
+    files = [os.path.join(ftp_csv_downloader.get_local_dir(remote_dir), filename)
+             for remote_dir in remote_dirs
+             for filename in os.listdir(ftp_csv_downloader.get_local_dir(remote_dir))
+             if filename.endswith(".csv")]
+    return elapsed, len(files), sum(os.path.getsize(path) for path in files)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark download strategies against a local FTPS server")
+    parser.add_argument("--days", type=int, default=2, help="Days of generated games (default: 2)")
+    parser.add_argument("--games", type=int, default=12, help="Games per day (default: 12)")
+    parser.add_argument("--rows", type=int, default=300, help="Pitches per game (default: 300)")
+    parser.add_argument("--latency-ms", type=float, default=0,
+                        help="Delay added to every control command, ~one round trip (default: 0)")
+    parser.add_argument("--bandwidth-kbps", type=int, default=0,
+                        help="Per-connection transfer limit in KB/sec (default: 0, unlimited)")
+    parser.add_argument("--strategies", default="serial,pooled,async",
+                        help="Comma-separated strategies to run (default: serial,pooled,async)")
+    parser.add_argument("--workers", type=int, default=4, help="Sessions for the pooled strategy (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Limit for the async strategy (default: 8)")
+    parser.add_argument("--repeat", type=int, default=2, help="Runs per strategy, best time is reported (default: 2)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Only run the seeded server until Ctrl+C and print its connection settings")
+    args = parser.parse_args()
+    strategies = args.strategies.split(",")
+    unknown = set(strategies) - {"serial", "pooled", "async"}
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+
+    start_day = datetime(2025, 3, 14)
+    days = [start_day + timedelta(days=n) for n in range(args.days)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root_dir = os.path.join(tmp_dir, "remote")
+        # Trackman's server has no _playerpositioning files in the CSV folders the downloader reads
+        written = generate_trackman_data.generate(root_dir, start_day, args.days, args.games, args.rows,
+                                                  positioning_share=0)
+        certfile = os.path.join(tmp_dir, "cert.pem")
+        write_self_signed_cert(certfile)
+        server, port = start_server(root_dir, certfile, args.latency_ms, args.bandwidth_kbps)
+        ftp_csv_downloader.FTP_HOST = "127.0.0.1"
+        ftp_csv_downloader.FTP_PORT = port
+        ftp_csv_downloader.FTP_USER = USER
+        ftp_csv_downloader.FTP_PASS = PASSWORD
+
+        try:
+            if args.serve:
+                print(f"Serving {len(written)} files for {days[0]:%Y-%m-%d}..{days[-1]:%Y-%m-%d}: "
+                      f"FTP_HOST=127.0.0.1 FTP_PORT={port} FTP_USER={USER} FTP_PASS={PASSWORD} (Ctrl+C to stop)")
+                while True:
+                    time.sleep(1)
+
+            print(f"{len(written)} remote files, latency {args.latency_ms:g} ms/command, "
+                  f"bandwidth {f'{args.bandwidth_kbps} KB/sec per connection' if args.bandwidth_kbps else 'unlimited'}, "
+                  f"best of {args.repeat}")
+            for strategy in strategies:
+                runs = [run_strategy(strategy, days, os.path.join(tmp_dir, f"{strategy}-{n}"),
+                                     args.workers, args.concurrency)
+                        for n in range(args.repeat)]
+                seconds, files, nbytes = min(runs)
+                detail = {"serial": "1 session", "pooled": f"{args.workers} sessions",
+                          "async": f"concurrency {args.concurrency}"}[strategy]
+                print(f"{f'{strategy} ({detail})':>24}: {seconds:7.3f} sec | {files / seconds:8.1f} files/sec | "
+                      f"{nbytes / 1024 / 1024 / seconds:7.2f} MB/sec | {files} files")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close_all()
+
+if __name__ == "__main__":
+    main()
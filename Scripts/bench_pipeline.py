@@ -0,0 +1,95 @@
+## === bench_pipeline === ##
+# End-to-end benchmark of the upload path: list_csv_files, the Level filter, reading,
+# clean_data and insert_to_db into SQLite (or --db-url), with throughput per stage
+# Runs on a tree generated with generate_trackman_data unless --root points at one, so
+# numbers are reproducible for a given --seed
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, text
+import csv_to_db
+import generate_trackman_data
+
+def run_once(root_dir, engine, table, reader):
+    # One pass over the tree into an empty table, returns seconds per stage and totals
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {engine.dialect.identifier_preparer.quote(table)}"))
+    seconds = dict.fromkeys(("list", "filter", "read", "clean", "insert"), 0.0)
+    totals = {"files": 0, "loaded": 0, "bytes": 0, "rows": 0}
+
+    start = time.perf_counter()
+    csv_files = csv_to_db.list_csv_files(root_dir)
+    seconds["list"] = time.perf_counter() - start
+
+    for file_path in csv_files:
+        totals["files"] += 1
+        totals["bytes"] += os.path.getsize(file_path)
+        start = time.perf_counter()
+        header, first_row = csv_to_db.read_first_row(file_path)
+        level = first_row[header.index('Level')] if header and first_row else None
+        seconds["filter"] += time.perf_counter() - start
+        if level != 'D1':
+            continue
+
+        start = time.perf_counter()
+        df = csv_to_db.read_csv_file(file_path, header, engine=reader)
+        seconds["read"] += time.perf_counter() - start
+        start = time.perf_counter()
+        df = csv_to_db.clean_data(df)
+        seconds["clean"] += time.perf_counter() - start
+        start = time.perf_counter()
+        result = csv_to_db.insert_to_db(df, table, engine, file_path)
+        seconds["insert"] += time.perf_counter() - start
+        if isinstance(result, Exception):
+            raise result
+        totals["loaded"] += 1
+        totals["rows"] += result
+    return seconds, totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list/read/clean/insert on synthetic Trackman data")
+    parser.add_argument("--root", help="Existing v3/YYYY/MM/DD tree to use instead of generating one")
+    parser.add_argument("--days", type=int, default=3, help="Days to generate (default: 3)")
+    parser.add_argument("--games", type=int, default=8, help="Games per day to generate (default: 8)")
+    parser.add_argument("--rows", type=int, default=300, help="Pitches per generated game (default: 300)")
+    parser.add_argument("--columns", type=int, default=170, help="Columns per generated game (default: 170)")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed (default: 0)")
+    parser.add_argument("--db-url", help="SQLAlchemy URL to insert into (default: a temporary SQLite file)")
+    parser.add_argument("--table", default="bench_pitches", help="Table recreated for each run (default: bench_pitches)")
+    parser.add_argument("--reader", choices=csv_to_db.READ_ENGINES, default="pandas-c",
+                        help="CSV reader engine (default: pandas-c)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs, the fastest total is reported (default: 3)")
+    args = parser.parse_args()
+    # Per-file insert logging would swamp the report
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root_dir = args.root
+        if root_dir is None:
+            root_dir = os.path.join(tmp_dir, "data")
+            generate_trackman_data.generate(root_dir, datetime(2025, 3, 14), args.days, args.games,
+                                            args.rows, args.columns, seed=args.seed)
+        engine = create_engine(args.db_url or f"sqlite:///{os.path.join(tmp_dir, 'bench.sqlite')}")
+
+        runs = [run_once(root_dir, engine, args.table, args.reader) for _ in range(args.repeat)]
+        seconds, totals = min(runs, key=lambda run: sum(run[0].values()))
+        engine.dispose()
+
+    mb = totals["bytes"] / 1024 / 1024
+    print(f"{totals['files']} files listed ({mb:.2f}MB), {totals['loaded']} D1 files loaded, "
+          f"{totals['rows']} rows | reader {args.reader}, best of {args.repeat}")
+    for stage, stage_seconds in seconds.items():
+        # Listing and the filter touch every file, the other stages only the D1 files
+        files = totals["files"] if stage in ("list", "filter") else totals["loaded"]
+        rate = f"{files / stage_seconds:10,.0f} files/sec" if stage_seconds else ""
+        rows = f"{totals['rows'] / stage_seconds:10,.0f} rows/sec" if stage_seconds and stage not in ("list", "filter") else ""
+        print(f"{stage:>7}: {stage_seconds:8.3f} sec {rate} {rows}")
+    total = sum(seconds.values())
+    print(f"{'total':>7}: {total:8.3f} sec {totals['rows'] / total:10,.0f} rows/sec {mb / total:8.2f} MB/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+## === bench_time_parsing === ##
+# Benchmark: legacy two-pass Time parsing vs the single-pass parser in csv_to_db
+# The legacy parser produced time-of-day values, which csv_to_db now makes in prepare_for_sql at write
+# time, so the single-pass parser is timed alone and end to end with that conversion
+# Runs over the Time column of a season of downloaded CSVs (--root) or synthetic values (--rows)
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from csv_to_db import list_csv_files, parse_time, prepare_for_sql
+
+def legacy_parse_time(times):
+    # Time handling clean_data used before the single-pass parser (with the fallback
+    # applied to the raw strings, so both variants produce the same values)
+    parsed = pd.to_datetime(times, format='%H:%M:%S.%f', errors='coerce')
+    parsed = parsed.fillna(pd.to_datetime(times, format='%H:%M:%S', errors='coerce'))
+    return parsed.dt.time
+
+def single_pass_end_to_end(times):
+    # parse_time plus the time-of-day conversion prepare_for_sql applies before the insert
+    return prepare_for_sql(pd.DataFrame({'Time': parse_time(times)}))['Time']
+
+def synthetic_times(rows, seed=0):
+    # Trackman-style times, half with fractional seconds
+    rng = np.random.default_rng(seed)
+    hours = rng.integers(11, 23, rows)
+    minutes = rng.integers(0, 60, rows)
+    seconds = rng.integers(0, 60, rows)
+    fraction = rng.integers(0, 100, rows)
+    return pd.Series([
+        f"{h}:{m:02d}:{s:02d}.{f:02d}" if f % 2 else f"{h}:{m:02d}:{s:02d}"
+        for h, m, s, f in zip(hours, minutes, seconds, fraction)
+    ])
+
+def season_times(root_dir):
+    # Time column of every CSV under a local YYYY/MM/DD tree
+    frames = [pd.read_csv(file_path, usecols=['Time']) for file_path in list_csv_files(root_dir)]
+    return pd.concat(frames, ignore_index=True)['Time']
+
+def best_of(func, times, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(times)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Time parsing in clean_data")
+    parser.add_argument("--root", help="Local season folder to read Time values from (e.g. $LOCAL_BASE_DIR/v3/2025)")
+    parser.add_argument("--rows", type=int, default=500_000, help="Synthetic rows when --root is not given")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per parser, best time is reported")
+    args = parser.parse_args()
+
+    times = season_times(args.root) if args.root else synthetic_times(args.rows)
+    source = args.root if args.root else "synthetic"
+    print(f"Parsing {len(times)} Time values ({source}), best of {args.repeat}")
+
+    legacy = best_of(legacy_parse_time, times, args.repeat)
+    single_pass = best_of(parse_time, times, args.repeat)
+    end_to_end = best_of(single_pass_end_to_end, times, args.repeat)
+    for name, seconds in (("legacy two-pass", legacy), ("single-pass", single_pass),
+                          ("end to end", end_to_end)):
+        print(f"{name:>16}: {seconds:.3f} sec ({len(times) / seconds:,.0f} rows/sec)")
+    # The parse alone leaves the time-of-day conversion to prepare_for_sql; end to end includes it
+    print(f"{'speedup (parse)':>16}: {legacy / single_pass:.2f}x")
+    print(f"{'speedup (e2e)':>16}: {legacy / end_to_end:.2f}x")
+
+    # The parsers must agree on every value they both parse
+    legacy_times = legacy_parse_time(times).astype(str)
+    mismatches = int((legacy_times != single_pass_end_to_end(times).astype(str)).sum())
+    print(f"{'mismatches':>16}: {mismatches}")
+
+if __name__ == "__main__":
+    main()
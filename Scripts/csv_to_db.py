@@ -4,32 +4,60 @@
 # Logs each action and reports batch-wise performance
 
 import re 
+import io
+import csv
+import hashlib
 import pandas as pd
 import logging
 import os
-import pyodbc
+import argparse
+import functools
+import queue
+import threading
 import time
 import psutil
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import trackman_schema
+import ingest_ledger
+import ftp_csv_downloader
+import pipeline_metrics
 
 load_dotenv()
 
-# Setup Logging
-log_dir = os.getenv("LOCAL_BASE_DIR", ".") + "/Logs"
-os.makedirs(log_dir, exist_ok=True)
-current_time = datetime.now().strftime('%Y%m%d_%H%M%S')
-log_path = os.path.join(log_dir, f'local_to_db_log_{current_time}.log')
+def setup_logging():
+    # Log to the console and a timestamped file under $LOCAL_BASE_DIR/Logs
+    # Called from main() rather than on import, so spawned worker processes and the benchmarks
+    # that import this module don't each start an empty log file
+    # Returns the path for the run's per-file and per-stage timings (JSON lines), alongside the log
+    log_dir = os.getenv("LOCAL_BASE_DIR", ".") + "/Logs"
+    os.makedirs(log_dir, exist_ok=True)
+    current_time = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_path = os.path.join(log_dir, f'local_to_db_log_{current_time}.log')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.FileHandler(log_path), logging.StreamHandler()])
+    return os.path.join(log_dir, f'local_to_db_metrics_{current_time}.jsonl')
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[logging.FileHandler(log_path), logging.StreamHandler()])
+# Prometheus metrics, exported with --metrics-dir (and by ftp_csv_downloader.py --watch --ingest)
+FILES_PROCESSED = pipeline_metrics.counter("trackman_db_files_total", "Files processed, by status")
+SKIPPED_FILES = pipeline_metrics.counter("trackman_db_skipped_files_total",
+                                         "Files skipped without an insert, by reason (level: non-D1, duplicate)")
+ROWS_INSERTED = pipeline_metrics.counter("trackman_db_rows_inserted_total", "Rows inserted into DB_TABLE")
+DUPLICATE_ROWS = pipeline_metrics.counter("trackman_db_duplicate_rows_total",
+                                          "Rows not inserted because their RowID was already loaded")
+INSERT_SECONDS = pipeline_metrics.histogram("trackman_db_insert_seconds",
+                                            "Seconds per database write (insert and commit) of a file or batch")
+LAST_RUN = pipeline_metrics.gauge("trackman_db_last_run_timestamp_seconds", "Unix time the last run finished")
 
-def get_yesterday_dir():
+def get_day_dir(day):
     # Match the FTP script's directory structure (e.g., /v3/YYYY/MM/DD)
-    yesterday = datetime.now() - timedelta(days=1)
-    return f"/v3/{yesterday.year}/{yesterday.strftime('%m')}/{yesterday.strftime('%d')}"
+    return f"/v3/{day.year}/{day.strftime('%m')}/{day.strftime('%d')}"
+
+def get_yesterday_dir():
+    return get_day_dir(datetime.now() - timedelta(days=1))
 
 def list_csv_files(root_dir):
     # Get list of CSV files for upload, skipping unverified or player tracking data
@@ -54,90 +82,767 @@ def list_csv_files(root_dir):
     logging.info(f"Total CSV files to process: {total}")
     return csv_files
 
+# Time values clean_data accepts: H:MM:SS or HH:MM:SS with up to microsecond fractions, as %H:%M:%S[.%f] did
+TIME_PATTERN = r'\d{1,2}:[0-5]\d:[0-5]\d(?:\.\d{1,6})?'
+
+def parse_time(times):
+    # Vectorised parse of both HH:MM:SS.ff and HH:MM:SS values, without per-format fallback passes
+    # Returns timedelta64 (time since midnight); anything else to_timedelta would take,
+    # e.g. "1:05:03 PM" or "1 days", and times of 24:00:00 or later become NaT
+    text = times.astype('string')
+    parsed = pd.to_timedelta(text.where(text.str.fullmatch(TIME_PATTERN, na=False)), errors='coerce')
+    return parsed.where(parsed < pd.Timedelta(days=1))
+
+# Part of the Parquet cache key; bump whenever clean_data's output changes so cached games are rebuilt
+CLEAN_VERSION = 2
+
 def clean_data(df):
+    # Only columns that need converting are touched: columns typed by the schema are used
+    # as read, and missing values stay missing so they reach the database as NULL
     df.rename(columns={'Top/Bottom': 'Top_Bottom'}, inplace=True)
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['Time'] = pd.to_datetime(df['Time'], format='%H:%M:%S.%f', errors='coerce')
-    df['Time'] = df['Time'].fillna(pd.to_datetime(df['Time'], format='%H:%M:%S', errors='coerce'))
-    df['Time'] = df['Time'].dt.time
+    df['Time'] = parse_time(df['Time'])
     df['RowID'] = df['GameID'] + '_' + df['PitchNo'].astype(str)
-    
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].astype(str)
-    
+
+    # Undeclared columns can mix numbers and text, which the ODBC driver rejects,
+    # so only those are normalised to strings
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True).startswith('mixed'):
+            df[col] = df[col].map(str, na_action='ignore')
+
+    return df
+
+def load_existing_rowids(engine, table, start, end):
+    # RowIDs already in the table for games between start and end (inclusive), fetched once per run
+    if not inspect(engine).has_table(table):
+        return set()
+    quote = engine.dialect.identifier_preparer.quote
+    query = text(f"SELECT RowID FROM {quote(table)} WHERE Date >= :start AND Date < :end")
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"start": start.replace(hour=0, minute=0, second=0, microsecond=0),
+                                    "end": end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)})
+        return {row[0] for row in rows}
+
+def drop_known_rows(df, known_rowids):
+    # Vectorised filter of pitches already in the database (or earlier in this run)
+    new_rows = df[~df['RowID'].isin(known_rowids)].drop_duplicates(subset='RowID')
+    # Record keys as they are handed to the writer so later files don't resend them
+    known_rowids.update(new_rows['RowID'])
+    return new_rows
+
+def prepare_for_sql(df):
+    # Time stays timedelta64 through cleaning and is only turned into time-of-day values
+    # for the TIME column when a frame is written
+    if pd.api.types.is_timedelta64_dtype(df['Time']):
+        df = df.assign(Time=(pd.Timestamp(0) + df['Time']).dt.time)
     return df
 
-def insert_to_db(df, table, engine, file_path):
+def add_timing(timings, stage, seconds):
+    # Accumulate stage seconds into an optional timings dict
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+def append_rows(df, table, engine, timings=None):
+    # to_sql inside an explicit transaction so the insert and the commit are timed separately
+    # The table is created up front, so parallel first loads don't each try to create it
+    create_missing_table(df, table, engine)
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        transaction = conn.begin()
+        df.to_sql(name=table, con=conn, if_exists='append', index=False)
+        inserted = time.perf_counter()
+        transaction.commit()
+        add_timing(timings, "insert", inserted - start)
+        add_timing(timings, "commit", time.perf_counter() - inserted)
+    INSERT_SECONDS.observe(time.perf_counter() - start)
+    ROWS_INSERTED.inc(len(df))
+
+def insert_to_db(df, table, engine, file_path, timings=None):
+    # Returns the rows inserted, or the exception if the insert failed
+    # timings (a dict) collects insert and commit seconds
+    df = prepare_for_sql(df)
     try:
-        df.to_sql(name=table, con=engine, if_exists='append', index=False)
+        append_rows(df, table, engine, timings)
         logging.info(f"{file_path} → Inserted {len(df)} rows")
+        return len(df)
     except IntegrityError as e:
         match = re.search(r"The duplicate key value is \((.*?)\)", str(e.orig))
         if match:
             logging.error(f"Integrity error: Duplicate key '{match.group(1)}' in {file_path}")
         else:
             logging.error(f"Integrity error: {e}")
+        return e
     except SQLAlchemyError as e:
         logging.error(f"SQLAlchemy error for {file_path}: {e}")
+        return e
     except Exception as e:
         logging.error(f"Unhandled error for {file_path}: {e}")
+        return e
+
+# Serialises creating a missing target table between concurrent backfill days
+target_table_lock = threading.Lock()
+
+def create_missing_table(df, table, engine):
+    # Local stand-in databases (e.g. SQLite) start without the target table
+    # The DDL is built from the whole frame, as to_sql would: from no rows pandas can't tell
+    # what object columns hold, and Time would become TEXT instead of TIME
+    with target_table_lock:
+        if not inspect(engine).has_table(table):
+            with engine.begin() as conn:
+                conn.execute(text(pd.io.sql.get_schema(df, table, con=conn)))
+
+def staging_table(table):
+    # One staging table per thread so concurrent backfill days don't collide
+    return f"{table}_staging_{os.getpid()}_{threading.get_ident()}"
+
+def merge_rows(conn, df, table, staging):
+    # Stage df and copy only RowIDs the target doesn't have, on conn's open transaction
+    # Returns the rows inserted
+    quote = conn.dialect.identifier_preparer.quote
+    columns = ", ".join(quote(col) for col in df.columns)
+    df.to_sql(name=staging, con=conn, if_exists='replace', index=False)
+    result = conn.execute(text(
+        f"INSERT INTO {quote(table)} ({columns}) "
+        f"SELECT {columns} FROM {quote(staging)} AS s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {quote(table)} AS t WHERE t.RowID = s.RowID)"
+    ))
+    conn.execute(text(f"DROP TABLE {quote(staging)}"))
+    return result.rowcount
+
+def merge_to_db(df, table, engine, label, timings=None):
+    # Bulk-load rows into a staging table, then copy only unseen RowIDs into the target
+    # in one set-based statement, so re-runs are idempotent and duplicates never raise
+    # Returns the rows inserted, or the exception if the merge failed
+    df = prepare_for_sql(df.drop_duplicates(subset='RowID'))
+
+    try:
+        create_missing_table(df, table, engine)
+        with engine.connect() as conn:
+            start = time.perf_counter()
+            transaction = conn.begin()
+            inserted = merge_rows(conn, df, table, staging_table(table))
+            merged = time.perf_counter()
+            transaction.commit()
+            add_timing(timings, "insert", merged - start)
+            add_timing(timings, "commit", time.perf_counter() - merged)
+        INSERT_SECONDS.observe(time.perf_counter() - start)
+        ROWS_INSERTED.inc(inserted)
+        DUPLICATE_ROWS.inc(len(df) - inserted)
+        logging.info(f"{label} → Inserted {inserted} new rows, skipped {len(df) - inserted} existing")
+        return inserted
+    except SQLAlchemyError as e:
+        logging.error(f"SQLAlchemy error merging {label}: {e}")
+        return e
+    except Exception as e:
+        logging.error(f"Unhandled error merging {label}: {e}")
+        return e
+
+def insert_batch(parsed, table, engine, load_mode='append', timings=None):
+    # Insert several files' rows with one to_sql call (one transaction)
+    # If the combined insert fails, retry file by file so one bad file doesn't sink the others
+    # Returns ([(file_path, result) per file], rows inserted), result as from insert_to_db; a merged
+    # batch only knows its combined count, so its files get None on success
+    df = pd.concat([file_df for _, file_df in parsed], ignore_index=True)
+    if load_mode == 'merge':
+        result = merge_to_db(df, table, engine, f"Batch of {len(parsed)} files", timings)
+        if isinstance(result, Exception):
+            return [(file_path, result) for file_path, _ in parsed], 0
+        return [(file_path, None) for file_path, _ in parsed], result
+
+    df = prepare_for_sql(df)
+    try:
+        append_rows(df, table, engine, timings)
+        logging.info(f"Batch of {len(parsed)} files → Inserted {len(df)} rows")
+        return [(file_path, len(file_df)) for file_path, file_df in parsed], len(df)
+    except Exception as e:
+        logging.warning(f"Batch insert of {len(parsed)} files failed ({type(e).__name__}), retrying file by file")
+
+    results = [(file_path, insert_to_db(file_df, table, engine, file_path, timings)) for file_path, file_df in parsed]
+    return results, sum(result for _, result in results if not isinstance(result, Exception))
+
+def read_first_row(file_path, data=None):
+    # Header and first data row only, either is None for empty files
+    # data: the file's bytes when it was streamed instead of saved
+    if data is not None:
+        f = io.TextIOWrapper(io.BytesIO(data), newline='', encoding='utf-8', errors='replace')
+    else:
+        f = open(file_path, newline='', encoding='utf-8', errors='replace')
+    with f:
+        reader = csv.reader(f)
+        return next(reader, None), next(reader, None)
+
+# pandas-c: pandas' C parser; pyarrow: multithreaded Arrow reader; arrow-stream: Arrow record-batch reader
+READ_ENGINES = ("pandas-c", "pyarrow", "arrow-stream")
+
+def read_csv_file(file_path, header, schema=trackman_schema.CURRENT_VERSION, engine="pandas-c"):
+    # Read one CSV with the schema's declared column types using the selected engine
+    # The Arrow engines keep Arrow-backed columns (dictionary columns become categoricals)
+    # file_path may also be a file object (streamed files are read from memory)
+    if engine == "pandas-c":
+        return pd.read_csv(file_path, dtype=trackman_schema.read_dtypes(header, schema))
+
+    import pyarrow as pa
+    import pyarrow.csv
+    convert_options = arrow_convert_options(header, schema)
+    if engine == "pyarrow":
+        table = pyarrow.csv.read_csv(file_path, read_options=pyarrow.csv.ReadOptions(use_threads=True),
+                                     convert_options=convert_options)
+    elif engine == "arrow-stream":
+        with open_arrow_csv(file_path, header, schema) as reader:
+            table = pa.Table.from_batches(list(reader), schema=reader.schema)
+    else:
+        raise ValueError(f"Unknown reader engine: {engine}")
+    return arrow_to_pandas(table)
+
+def arrow_convert_options(header, schema, column_types=None):
+    # column_types: extra types for columns the schema doesn't declare
+    import pyarrow.csv
+    return pyarrow.csv.ConvertOptions(
+        column_types={**trackman_schema.arrow_types(header, schema), **(column_types or {})},
+        strings_can_be_null=True,  # blank text is NULL, as with pandas
+    )
+
+def open_arrow_csv(source, header, schema, block_size=None):
+    # Arrow's streaming CSV reader, which fixes undeclared columns' types from the first block
+    # A column blank throughout that block is typed null and would fail on its first value,
+    # so the file is reopened with those columns read as text
+    import pyarrow as pa
+    import pyarrow.csv
+    read_options = pyarrow.csv.ReadOptions(block_size=block_size) if block_size else pyarrow.csv.ReadOptions()
+    # In-memory (streamed) files get a fresh Arrow reader per open, since the first reader's
+    # read-ahead would keep consuming a shared file object
+    open_source = (lambda: pa.BufferReader(source.getvalue())) if isinstance(source, io.BytesIO) else (lambda: source)
+    reader = pyarrow.csv.open_csv(open_source(), read_options=read_options,
+                                  convert_options=arrow_convert_options(header, schema))
+    null_columns = {field.name: pa.string() for field in reader.schema if pa.types.is_null(field.type)}
+    if not null_columns:
+        return reader
+    reader.close()
+    return pyarrow.csv.open_csv(open_source(), read_options=read_options,
+                                convert_options=arrow_convert_options(header, schema, null_columns))
+
+def arrow_to_pandas(table):
+    # Arrow-backed columns, except dictionary columns which become categoricals
+    import pyarrow as pa
+    return table.to_pandas(types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t))
+
+def rows_per_chunk(file_path, chunk_bytes):
+    # Rows in about chunk_bytes of CSV, from the average line length of the file's first MB
+    with open(file_path, "rb") as f:
+        sample = f.read(1024 * 1024)
+    return max(1, chunk_bytes * max(sample.count(b"\n"), 1) // max(len(sample), 1))
+
+def read_csv_chunks(file_path, header, chunk_bytes, schema=trackman_schema.CURRENT_VERSION, engine="pandas-c"):
+    # Yields frames of about chunk_bytes of CSV each, typed like read_csv_file, so only one
+    # chunk of a large file is held at a time; the Arrow engines read one block per chunk
+    if engine == "pandas-c":
+        with pd.read_csv(file_path, dtype=trackman_schema.read_dtypes(header, schema),
+                         chunksize=rows_per_chunk(file_path, chunk_bytes)) as reader:
+            yield from reader
+        return
+    if engine not in READ_ENGINES:
+        raise ValueError(f"Unknown reader engine: {engine}")
+
+    with open_arrow_csv(file_path, header, schema, block_size=chunk_bytes) as reader:
+        for batch in reader:
+            yield arrow_to_pandas(batch)
+
+def get_cache_path(cache_dir, header, first_row, checksum, schema):
+    # Cleaned game location: <cache_dir>/Date=YYYY-MM-DD/GameID=<id>/<source sha256>.<schema>.c<CLEAN_VERSION>.parquet
+    # Keyed by the source checksum, schema and cleaning version, so neither a re-published file
+    # nor a change to clean_data ever hits a stale entry
+    raw_date = first_row[header.index('Date')]
+    try:
+        game_date = pd.Timestamp(raw_date).strftime('%Y-%m-%d')
+    except ValueError:
+        game_date = re.sub(r'[^0-9A-Za-z-]', '-', raw_date)
+    game_id = re.sub(r'[^0-9A-Za-z_.-]', '-', first_row[header.index('GameID')])
+    return os.path.join(cache_dir, f"Date={game_date}", f"GameID={game_id}", f"{checksum}.{schema}.c{CLEAN_VERSION}.parquet")
+
+def write_cache(df, cache_path):
+    # Written under a temp name so concurrent workers never see a partial file
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_path)
+
+def parse_file(file_path, schema=trackman_schema.CURRENT_VERSION, engine="pandas-c", cache_dir=None, data=None,
+               chunk_bytes=0):
+    # Read, filter and clean one CSV, safe to run in a worker process
+    # Returns (df, skip_reason, stats), df is None for skipped files
+    # stats: file size in bytes, seconds spent in the Level filter, reading (CSV or cache) and
+    # cleaning, parse (read + clean), whether the frame came from the Parquet cache in cache_dir,
+    # and whether the file was left for load_chunked
+    # data: the file's bytes when it was streamed from the FTP server, file_path then only labels it
+    # chunk_bytes: D1 files on disk larger than this are only filtered here (df None, stats["chunked"]),
+    # the writer then reads them chunk by chunk with load_chunked
+    size = len(data) if data is not None else os.path.getsize(file_path)
+    stats = {"bytes": size, "filter": 0.0, "read": 0.0, "clean": 0.0, "parse": 0.0, "cached": False,
+             "chunked": False}
+
+    # Skipping non D1 data before paying for a full parse
+    # Files without data rows are left to the full parse to report
+    start = time.perf_counter()
+    header, first_row = read_first_row(file_path, data)
+    level = first_row[header.index('Level')] if header and first_row else None
+    stats["filter"] = time.perf_counter() - start
+    if level is not None and level != 'D1':
+        return None, f"Level = {level}", stats
+    if chunk_bytes and data is None and size > chunk_bytes:
+        # Bypasses the Parquet cache, which needs the whole cleaned frame
+        stats["chunked"] = True
+        return None, None, stats
+
+    start = time.perf_counter()
+    cache_path = None
+    if cache_dir and first_row:
+        checksum = hashlib.sha256(data).hexdigest() if data is not None else ftp_csv_downloader.file_checksum(file_path)
+        cache_path = get_cache_path(cache_dir, header, first_row, checksum, schema)
+        if os.path.exists(cache_path):
+            df = pd.read_parquet(cache_path)
+            stats["read"] = stats["parse"] = time.perf_counter() - start
+            stats["cached"] = True
+            return df, None, stats
+
+    df = read_csv_file(io.BytesIO(data) if data is not None else file_path, header or [], schema, engine)
+    stats["read"] = time.perf_counter() - start
+    df = clean_data(df)
+    if cache_path:
+        write_cache(df, cache_path)
+    stats["parse"] = time.perf_counter() - start
+    stats["clean"] = stats["parse"] - stats["read"]
+    return df, None, stats
+
+def load_chunked(file_path, table, engine, chunk_bytes, load_mode='append', known_rowids=None,
+                 schema=trackman_schema.CURRENT_VERSION, reader="pandas-c", timings=None):
+    # Read, clean and write one large file a chunk at a time, so memory holds about one chunk
+    # whatever the file size; all chunks go in one transaction, a failure leaves nothing behind
+    # parse_file's first-row Level check only lets the file this far: a concatenated export can
+    # switch levels part way through, so each chunk keeps just its D1 rows
+    # RowIDs come from each row's GameID and PitchNo alone
+    # known_rowids carries across chunks, and in merge mode each chunk is checked against the
+    # rows earlier chunks added in the same transaction
+    # Returns (rows read, rows inserted or the exception); timings collects read, clean, insert, commit
+    staging = staging_table(table)
+    header, _ = read_first_row(file_path)
+    rows_read = 0
+    inserted = 0
+    chunks = 0
+    other_levels = 0
+    table_checked = False
+    try:
+        reader_chunks = read_csv_chunks(file_path, header, chunk_bytes, schema, reader)
+        with engine.connect() as conn:
+            write_start = time.perf_counter()
+            transaction = conn.begin()
+            while True:
+                start = time.perf_counter()
+                df = next(reader_chunks, None)
+                read = time.perf_counter()
+                add_timing(timings, "read", read - start)
+                if df is None:
+                    break
+                level_rows = len(df)
+                df = clean_data(df[df['Level'] == 'D1'])
+                other_levels += level_rows - len(df)
+                add_timing(timings, "clean", time.perf_counter() - read)
+                chunks += 1
+                rows_read += len(df)
+                if known_rowids is not None:
+                    parsed_rows = len(df)
+                    df = drop_known_rows(df, known_rowids)
+                    DUPLICATE_ROWS.inc(parsed_rows - len(df))
+                if df.empty:
+                    continue
+
+                start = time.perf_counter()
+                df = prepare_for_sql(df)
+                if not table_checked:
+                    # Before this file's first write, so the check and create don't wait on its transaction
+                    create_missing_table(df, table, engine)
+                    table_checked = True
+                if load_mode == 'merge':
+                    df = df.drop_duplicates(subset='RowID')
+                    chunk_inserted = merge_rows(conn, df, table, staging)
+                    DUPLICATE_ROWS.inc(len(df) - chunk_inserted)
+                else:
+                    df.to_sql(name=table, con=conn, if_exists='append', index=False)
+                    chunk_inserted = len(df)
+                inserted += chunk_inserted
+                add_timing(timings, "insert", time.perf_counter() - start)
+            start = time.perf_counter()
+            transaction.commit()
+            add_timing(timings, "commit", time.perf_counter() - start)
+        INSERT_SECONDS.observe(time.perf_counter() - write_start)
+        ROWS_INSERTED.inc(inserted)
+        skipped = f", skipped {other_levels} non-D1 rows" if other_levels else ""
+        logging.info(f"{file_path} → Inserted {inserted} of {rows_read} rows in {chunks} chunks{skipped}")
+        return rows_read, inserted
+    except SQLAlchemyError as e:
+        logging.error(f"SQLAlchemy error for {file_path} (chunk {chunks}): {e}")
+        return rows_read, e
+    except Exception as e:
+        logging.error(f"Unhandled error for {file_path} (chunk {chunks}): {e}")
+        return rows_read, e
+
+def iter_parsed(csv_files, pool, max_pending, parse=parse_file):
+    # Yields (file_path, parse_file result or the exception it raised) as files finish parsing,
+    # so the caller's insert for one file overlaps with parsing the next ones
+    # At most `max_pending` files are parsing or waiting for the writer, which bounds memory
+    if pool is None:
+        # Single parser thread feeding the writer through a bounded queue
+        parsed = queue.Queue(maxsize=max_pending)
+
+        def producer():
+            for file_path in csv_files:
+                try:
+                    parsed.put((file_path, parse(file_path)))
+                except Exception as e:
+                    parsed.put((file_path, e))
+
+        threading.Thread(target=producer, daemon=True).start()
+        for _ in csv_files:
+            yield parsed.get()
+        return
+
+    files = iter(csv_files)
+    futures = {}
+
+    def submit_next():
+        file_path = next(files, None)
+        if file_path is not None:
+            futures[pool.submit(parse, file_path)] = file_path
+
+    for _ in range(max_pending):
+        submit_next()
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            file_path = futures.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = e
+            # Refill the freed slot before handing the result to the writer
+            submit_next()
+            yield file_path, result
+
+def process_files(csv_files, table, engine, pool=None, max_pending=4, batch_rows=0, load_mode='append',
+                  known_rowids=None, schema=trackman_schema.CURRENT_VERSION, reader="pandas-c", cache_dir=None,
+                  ledger_path=None, fetch=None, metrics=None, chunk_bytes=0):
+    # Read, filter, clean and insert each file, returns the rows inserted
+    # Parsing runs ahead of the single writer (in a thread, or a process pool if given)
+    # With batch_rows set, rows from several files are combined into one insert per batch
+    # load_mode 'merge' loads through a staging table and skips RowIDs already in the table
+    # known_rowids (a set) drops already-loaded pitches before anything is sent to the database
+    # schema picks the trackman_schema version used to type columns, reader the READ_ENGINES entry
+    # cache_dir enables the Parquet cache of cleaned games
+    # ledger_path records each file's outcome in the ingest ledger
+    # fetch(file_path) returns a file's bytes when files are streamed rather than read from disk;
+    # it runs on the single parser thread, so pool must be None
+    # metrics (a pipeline_metrics.StageMetrics) gets each file's stage timings
+    # chunk_bytes: files on disk larger than this are read, cleaned and written in chunks of about
+    # this much CSV by the writer (load_chunked), bounding memory for oversized exports
+    batch_size = 100
+    total_rows = 0
+    parse_seconds = 0.0
+    insert_seconds = 0.0
+    cached = {"files": 0, "seconds": 0.0}
+    parsed_bytes = 0
+    # Level filter counters: files and bytes skipped without a full parse, time spent checking
+    filtered = {"files": 0, "bytes": 0, "seconds": 0.0}
+    memory_before = psutil.Process().memory_info().rss / 1024 / 1024
+    insert_buffer = []
+    buffered_rows = 0
+    # Per file until its write finishes: rows after the Level filter (before RowID dedup),
+    # bytes and stage seconds, for the ledger and metrics
+    file_info = {}
+
+    def finish(file_path, result, timings=None, skip_reason=None):
+        # result: rows inserted, None (finished without a row count) or the exception
+        info = file_info.pop(file_path, {"rows": None, "bytes": 0, "seconds": {}})
+        if skip_reason is not None:
+            status, rows_inserted, error = "skipped", 0, skip_reason
+        elif isinstance(result, Exception):
+            status, rows_inserted, error = "failed", None, result
+        else:
+            status, rows_inserted, error = "inserted", result, None
+        if ledger_path is not None:
+            ingest_ledger.record_upload(ledger_path, file_path, status, info["rows"], rows_inserted, error=error)
+        FILES_PROCESSED.inc(status=status)
+        if metrics is not None:
+            metrics.record_file(file_path, status, {**info["seconds"], **(timings or {})},
+                                info["rows"] or 0, info["bytes"])
+
+    parse = functools.partial(parse_file, schema=schema, engine=reader, cache_dir=cache_dir, chunk_bytes=chunk_bytes)
+    if fetch is not None:
+        # Streamed files are transferred and parsed back to back on the parser thread
+        parse_bytes = parse
+        parse = lambda file_path: parse_bytes(file_path, data=fetch(file_path))
+    for n, (file_path, result) in enumerate(iter_parsed(csv_files, pool, max_pending, parse), start=1):
+        if isinstance(result, Exception):
+            logging.error(f"Error reading {file_path}: {result}")
+            finish(file_path, result)
+        else:
+            df, skip_reason, stats = result
+            file_info[file_path] = {
+                "rows": len(df) if df is not None else None, "bytes": stats["bytes"],
+                "seconds": {stage: stats[stage] for stage in ("filter", "read", "clean") if stats[stage]},
+            }
+            filtered["seconds"] += stats["filter"]
+            if stats["chunked"]:
+                parsed_bytes += stats["bytes"]
+            elif df is None:
+                SKIPPED_FILES.inc(reason="level")
+                filtered["files"] += 1
+                filtered["bytes"] += stats["bytes"]
+            elif stats["cached"]:
+                cached["files"] += 1
+                cached["seconds"] += stats["parse"]
+            else:
+                parse_seconds += stats["parse"]
+                parsed_bytes += stats["bytes"]
+            if df is not None and known_rowids is not None:
+                parsed_rows = len(df)
+                df = drop_known_rows(df, known_rowids)
+                DUPLICATE_ROWS.inc(parsed_rows - len(df))
+                if df.empty:
+                    SKIPPED_FILES.inc(reason="duplicate")
+                    df, skip_reason = None, f"all {parsed_rows} rows already loaded"
+                elif len(df) < parsed_rows:
+                    logging.info(f"{file_path}: {parsed_rows - len(df)} of {parsed_rows} rows already loaded")
+            if stats["chunked"]:
+                # Reading and cleaning happen here with the writes, chunk by chunk
+                insert_start = time.perf_counter()
+                timings = {}
+                rows, result = load_chunked(file_path, table, engine, chunk_bytes, load_mode, known_rowids,
+                                            schema, reader, timings)
+                chunk_parse = timings.get("read", 0.0) + timings.get("clean", 0.0)
+                parse_seconds += chunk_parse
+                insert_seconds += time.perf_counter() - insert_start - chunk_parse
+                file_info[file_path]["rows"] = rows
+                finish(file_path, result, timings)
+                if not isinstance(result, Exception):
+                    total_rows += result
+            elif df is None:
+                logging.info(f"Skipped {file_path}, {skip_reason}")
+                finish(file_path, None, skip_reason=skip_reason)
+            elif batch_rows > 0:
+                insert_buffer.append((file_path, df))
+                buffered_rows += len(df)
+            else:
+                insert_start = time.perf_counter()
+                timings = {}
+                if load_mode == 'merge':
+                    result = merge_to_db(df, table, engine, file_path, timings)
+                else:
+                    result = insert_to_db(df, table, engine, file_path, timings)
+                insert_seconds += time.perf_counter() - insert_start
+                finish(file_path, result, timings)
+                if not isinstance(result, Exception):
+                    total_rows += result
+
+        # Flush once the buffer reaches batch_rows, or whatever is left after the last file
+        if insert_buffer and (buffered_rows >= batch_rows or n == len(csv_files)):
+            insert_start = time.perf_counter()
+            timings = {}
+            results, inserted = insert_batch(insert_buffer, table, engine, load_mode, timings)
+            insert_seconds += time.perf_counter() - insert_start
+            total_rows += inserted
+            # A batch's insert and commit time is shared out by each file's row count
+            for (file_path, result), (_, file_df) in zip(results, insert_buffer):
+                share = len(file_df) / buffered_rows if buffered_rows else 1 / len(insert_buffer)
+                finish(file_path, result, {stage: seconds * share for stage, seconds in timings.items()})
+            insert_buffer = []
+            buffered_rows = 0
+
+        # Memory report every `batch_size` files
+        if n % batch_size == 0 or n == len(csv_files):
+            memory_after = psutil.Process().memory_info().rss / 1024 / 1024
+            logging.info(f"Processed batch {(n - 1) // batch_size + 1} | Mem: {memory_before:.2f}MB → {memory_after:.2f}MB")
+            memory_before = memory_after
+
+    summed = " (summed across workers)" if pool is not None else ""
+    logging.info(f"Stage timing: parse {parse_seconds:.2f} sec{summed}, insert {insert_seconds:.2f} sec")
+    if cached["files"]:
+        logging.info(f"Parquet cache: {cached['files']} files loaded without parsing in {cached['seconds']:.2f} sec")
+    if filtered["files"]:
+        # Estimate the parse time avoided from this run's own seconds-per-byte
+        saved = filtered["bytes"] * parse_seconds / parsed_bytes if parsed_bytes else 0.0
+        logging.info(f"Level filter: skipped {filtered['files']} files ({filtered['bytes'] / 1024 / 1024:.2f}MB) "
+                     f"in {filtered['seconds'] * 1000:.2f} ms, saving ~{saved:.2f} sec of parsing")
+    return total_rows
+
+def process_day(local_base, day_dir, table, engine, **options):
+    # Upload every CSV under one local date folder, returns (files, rows)
+    # options are passed through to process_files
+    # With a ledger_path, files the ledger already has as inserted or skipped (and unchanged
+    # on disk) are left out unless reprocess is set
+    reprocess = options.pop('reprocess', False)
+    root_dir = os.path.join(local_base, day_dir.lstrip('/'))
+    list_start = time.perf_counter()
+    csv_files = list_csv_files(root_dir)
+    if options.get('metrics') is not None:
+        options['metrics'].record_stage("list", time.perf_counter() - list_start, day=day_dir, files=len(csv_files))
+    if not csv_files:
+        logging.info(f"No CSV files found in {root_dir}.")
+        return 0, 0
+
+    if options.get('ledger_path') and not reprocess:
+        pending = ingest_ledger.pending_uploads(options['ledger_path'], csv_files)
+        if len(pending) < len(csv_files):
+            logging.info(f"Ledger: {len(csv_files) - len(pending)} of {len(csv_files)} files in {day_dir} "
+                         f"already uploaded, {len(pending)} to process")
+        csv_files = pending
+        if not csv_files:
+            return 0, 0
+
+    start_time = time.time()
+    total_rows = process_files(csv_files, table, engine, **options)
+    elapsed = time.time() - start_time
+    logging.info(f"Complete: {day_dir} {len(csv_files)} files, {total_rows} rows in {elapsed:.2f} sec")
+    return len(csv_files), total_rows
+
+def create_db_engine():
+    # DB_URL (any SQLAlchemy URL, e.g. sqlite:///trackman.db) overrides the Azure SQL settings
+    db_url = os.getenv("DB_URL")
+    if db_url:
+        return create_engine(db_url)
 
-def main():
-    # Load from environment
     db_username = os.getenv("DB_USER")
     db_password = os.getenv("DB_PASS")
     db_server = os.getenv("DB_SERVER")
     db_database = os.getenv("DB_NAME")
-    local_base = os.getenv("LOCAL_BASE_DIR")
-    table = os.getenv("DB_TABLE")
-
-    yesterday_dir = get_yesterday_dir()
-    root_dir = os.path.join(local_base, yesterday_dir.lstrip('/'))
-
     conn_str = (
         f"DRIVER={{ODBC Driver 17 for SQL Server}};"
         f"SERVER={db_server};DATABASE={db_database};"
         f"UID={db_username};PWD={db_password}"
     )
-    engine = create_engine(f"mssql+pyodbc:///?odbc_connect={conn_str}", fast_executemany=True)
+    return create_engine(f"mssql+pyodbc:///?odbc_connect={conn_str}", fast_executemany=True)
 
-    try:
-        csv_files = list_csv_files(root_dir)
-        if not csv_files:
-            logging.info("No CSV files found.")
-            return
+def log_metrics_summary(metrics, elapsed):
+    # One log line of per-stage p50/p95 next to the full summary in the metrics file
+    summary = metrics.summary(elapsed)
+    stages = ", ".join(f"{stage} {stats['p50'] * 1000:.1f}/{stats['p95'] * 1000:.1f}"
+                       for stage, stats in summary["stages"].items())
+    if stages:
+        logging.info(f"Stage p50/p95 (ms): {stages}")
+    logging.info(f"Throughput: {summary['rows_per_sec'] or 0:,.0f} rows/sec, {summary['mb_per_sec'] or 0:.2f} MB/sec "
+                 f"| metrics: {metrics.path}")
 
-        batch_size = 100
-        total_rows = 0
-        start_time = time.time()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clean and upload downloaded Trackman CSVs to the database")
+    parser.add_argument("--start", type=ftp_csv_downloader.parse_date,
+                        help="Backfill from this date (YYYY-MM-DD) instead of yesterday")
+    parser.add_argument("--end", type=ftp_csv_downloader.parse_date,
+                        help="Last date of the backfill, inclusive (YYYY-MM-DD, default: yesterday)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes parsing and cleaning CSVs in parallel (default: 1, serial)")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="Parsed files allowed to wait for the database writer (default: 4)")
+    parser.add_argument("--batch-rows", type=int, default=0,
+                        help="Combine rows from several files into one insert of about this many rows "
+                             "(default: 0, one insert per file)")
+    parser.add_argument("--load-mode", choices=["append", "merge"], default="append",
+                        help="append: insert straight into DB_TABLE; merge: bulk-load a staging table and "
+                             "insert only new RowIDs (default: append)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Load existing RowIDs for the target dates once and only send new pitches")
+    parser.add_argument("--schema", choices=sorted(trackman_schema.SCHEMAS), default=trackman_schema.CURRENT_VERSION,
+                        help=f"Trackman column schema used to type columns (default: {trackman_schema.CURRENT_VERSION})")
+    parser.add_argument("--reader", choices=READ_ENGINES, default="pandas-c",
+                        help="CSV reader engine; pyarrow and arrow-stream need the pyarrow package (default: pandas-c)")
+    parser.add_argument("--cache-dir", default=os.getenv("PARQUET_CACHE_DIR"),
+                        help="Cache cleaned games as Parquet here and reuse them on re-runs; needs pyarrow "
+                             "(default: $PARQUET_CACHE_DIR, unset disables the cache)")
+    parser.add_argument("--chunk-mb", type=float, default=0,
+                        help="Read, clean and insert files larger than this many MB in chunks of about this "
+                             "size, in one transaction per file, to cap memory on oversized exports "
+                             "(default: 0, whole files)")
+    parser.add_argument("--day-workers", type=int, default=4,
+                        help="Number of days processed concurrently in backfill mode (default: 4)")
+    parser.add_argument("--metrics-dir", default=os.getenv("METRICS_TEXTFILE_DIR"),
+                        help="Write Prometheus metrics to csv_to_db.prom here for node-exporter's textfile "
+                             "collector (default: $METRICS_TEXTFILE_DIR, unset disables it)")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="Upload every file again, including ones the ingest ledger has as finished")
+    args = parser.parse_args()
+    if args.reader != "pandas-c" or args.cache_dir:
+        try:
+            import pyarrow
+        except ImportError:
+            parser.error("--reader pyarrow/arrow-stream and --cache-dir require the pyarrow package")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    if args.chunk_mb < 0:
+        parser.error("--chunk-mb must not be negative")
+    if args.end and not args.start:
+        parser.error("--end requires --start")
+    if args.start:
+        args.end = args.end or datetime.now() - timedelta(days=1)
+        if args.end < args.start:
+            parser.error("--end must not be before --start")
+    return args
 
-        for i in range(0, len(csv_files), batch_size):
-            # Optional batch file processing for performance
-            batch = csv_files[i:i + batch_size]
-            memory_before = psutil.Process().memory_info().rss / 1024 / 1024
+def main():
+    args = parse_args()
+    metrics_path = setup_logging()
 
-            for file_path in batch:
-                try:
-                    df = pd.read_csv(file_path)
-                    # Skipping non D1 data
-                    if df['Level'].iloc[0] != 'D1':
-                        logging.info(f"Skipped {file_path}, Level = {df['Level'].iloc[0]}")
-                        continue
-                    df = clean_data(df)
-                    insert_to_db(df, table, engine, file_path)
-                    total_rows += len(df)
-                except Exception as e:
-                    logging.error(f"Error reading {file_path}: {e}")
+    # Load from environment
+    local_base = os.getenv("LOCAL_BASE_DIR")
+    table = os.getenv("DB_TABLE")
+    engine = create_db_engine()
 
-            memory_after = psutil.Process().memory_info().rss / 1024 / 1024
-            logging.info(f"Processed batch {i // batch_size + 1} | Mem: {memory_before:.2f}MB → {memory_after:.2f}MB")
+    # Parsing fans out to worker processes, inserts stay on this process's engine
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    options = {
+        "pool": pool,
+        # Files in flight ahead of the writer: one per busy worker plus the queued results
+        "max_pending": args.queue_size + (args.workers if pool is not None else 0),
+        "batch_rows": args.batch_rows,
+        "load_mode": args.load_mode,
+        "schema": args.schema,
+        "reader": args.reader,
+        "cache_dir": args.cache_dir,
+        "chunk_bytes": int(args.chunk_mb * 1024 * 1024),
+        "ledger_path": ingest_ledger.default_path(local_base),
+        "reprocess": args.reprocess,
+        "metrics": pipeline_metrics.StageMetrics(metrics_path),
+    }
 
+    run_start = time.time()
+    try:
+        if args.dedup:
+            start = args.start or datetime.now() - timedelta(days=1)
+            end = args.end or start
+            options["known_rowids"] = load_existing_rowids(engine, table, start, end)
+            logging.info(f"Loaded {len(options['known_rowids'])} existing RowIDs for dedup")
+
+        if not args.start:
+            process_day(local_base, get_yesterday_dir(), table, engine, **options)
+            return
+
+        # Backfill: days share the engine's connection pool, at most `day_workers` in flight
+        days = ftp_csv_downloader.date_range(args.start, args.end)
+        logging.info(f"Backfilling {len(days)} day(s), {args.day_workers} at a time")
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=args.day_workers) as day_pool:
+            results = list(day_pool.map(
+                lambda day: process_day(local_base, get_day_dir(day), table, engine, **options), days))
         elapsed = time.time() - start_time
-        logging.info(f"Complete: {len(csv_files)} files, {total_rows} rows in {elapsed:.2f} sec")
+        total_files = sum(files for files, _ in results)
+        total_rows = sum(rows for _, rows in results)
+        logging.info(f"Backfill complete: {len(days)} days, {total_files} files, {total_rows} rows in {elapsed:.2f} sec")
 
     except Exception as e:
         logging.error(f"Fatal error: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        log_metrics_summary(options["metrics"], time.time() - run_start)
+        LAST_RUN.set(time.time())
+        if args.metrics_dir:
+            pipeline_metrics.write_textfile(args.metrics_dir, "csv_to_db")
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,24 @@
 ## === ftp_csv_downloader === ##
 # ETL Pipeline: Trackman FTP Server to Local Directory
 # Downloads nightly CSVs from a structured FTP path based on YYYY/MM/DD
-# Skips existing files and logs activity to a local text file
+# Skips unchanged files (tracked in a per-day manifest) and logs activity to a local text file
+# Each download is recorded in the shared ingest ledger for csv_to_db.py
+# --watch polls today's folder on game days over one persistent session
 
-from ftplib import FTP_TLS
+from ftplib import FTP, FTP_TLS, error_perm, all_errors
 import os
+import argparse
+import asyncio
+import hashlib
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import ingest_ledger
+import pipeline_metrics
 
 load_dotenv()
 
@@ -14,48 +26,356 @@ load_dotenv()
 FTP_HOST = os.getenv("FTP_HOST")
 FTP_USER = os.getenv("FTP_USER")
 FTP_PASS = os.getenv("FTP_PASS")
+FTP_PORT = int(os.getenv("FTP_PORT", "21"))
 LOCAL_BASE_DIR = os.getenv("LOCAL_BASE_DIR")
+LEDGER_PATH = ingest_ledger.default_path(LOCAL_BASE_DIR)
+
+# In-progress downloads are written here and renamed once complete
+PART_SUFFIX = ".part"
+# Remote size and modify time the partial was started from, so a re-published file isn't resumed
+PARTIAL_INFO_SUFFIX = ".part.json"
+# Per-day record of what has been downloaded (name, size, modify time, checksum)
+MANIFEST_NAME = ".manifest.json"
+
+# === Prometheus metrics (exported with --metrics-dir or, in watch mode, --metrics-port) ===
+FILES_DOWNLOADED = pipeline_metrics.counter("trackman_ftp_files_downloaded_total", "CSV files downloaded")
+BYTES_DOWNLOADED = pipeline_metrics.counter("trackman_ftp_bytes_downloaded_total", "Bytes downloaded")
+DOWNLOAD_FAILURES = pipeline_metrics.counter("trackman_ftp_download_failures_total", "Failed file downloads")
+TRANSFER_SECONDS = pipeline_metrics.histogram("trackman_ftp_transfer_seconds",
+                                              "Seconds per file download, data channel handshake included")
+LAST_RUN = pipeline_metrics.gauge("trackman_ftp_last_run_timestamp_seconds",
+                                  "Unix time the last run or watch poll finished")
+
+def get_remote_dir(day):
+    # Returns FTP server filepath for data from the given day
+    return f"/v3/{day.year}/{day.strftime('%m')}/{day.strftime('%d')}/CSV"
 
 def get_yesterday_remote_dir():
     # Returns FTP server filepath for data from previous day
-    yesterday = datetime.now() - timedelta(days=1)
-    return f"/v3/{yesterday.year}/{yesterday.strftime('%m')}/{yesterday.strftime('%d')}/CSV"
+    return get_remote_dir(datetime.now() - timedelta(days=1))
+
+def parse_date(value):
+    # argparse type for YYYY-MM-DD dates
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+def date_range(start, end):
+    # Every day from start to end, inclusive
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+class SizeMismatchError(Exception):
+    # A finished transfer whose size doesn't match the listing
+    # Deliberately not an OSError (and so not in ftplib.all_errors): the file failed, the session is fine
+    pass
+
+class SessionReuseFTP_TLS(FTP_TLS):
+    # FTP_TLS that resumes the control connection's TLS session on each data connection,
+    # so data channels skip a full handshake (and servers requiring session reuse accept them)
+    # The last data channel's handshake time and whether it resumed are kept for reporting
+    last_handshake = 0.0
+    last_session_reused = False
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = FTP.ntransfercmd(self, cmd, rest)
+        if self._prot_p:
+            start = time.perf_counter()
+            conn = self.context.wrap_socket(conn, server_hostname=self.host, session=self.sock.session)
+            self.last_handshake = time.perf_counter() - start
+            self.last_session_reused = conn.session_reused
+        return conn, size
 
 def connect_ftp_tls():
-    # Establishes FTPS connection
-    ftps = FTP_TLS()
-    ftps.connect(FTP_HOST, 21)
+    # Establishes FTPS connection, reporting the setup cost (TCP + TLS handshake + login)
+    start = time.perf_counter()
+    ftps = SessionReuseFTP_TLS()
+    ftps.connect(FTP_HOST, FTP_PORT)
     ftps.login(FTP_USER, FTP_PASS)
     ftps.prot_p()
+    print(f"Connected to {FTP_HOST} in {(time.perf_counter() - start) * 1000:.1f} ms (TCP + TLS + login)")
     return ftps
 
+def is_wanted_csv(filename):
+    # CSVs only, skipping files marked unverified
+    return filename.lower().endswith('.csv') and 'unverified' not in filename.lower()
+
 def list_remote_csvs(ftp, remote_dir):
-    # List CSVs in FTP path, skipping files marked unverified
+    # List CSVs in FTP path with their size and modify time: {filename: {"size", "modify"}}
+    # Uses a single MLSD round trip, falling back to NLST + SIZE/MDTM on servers without it
     ftp.cwd(remote_dir)
-    return [
-        filename for filename in ftp.nlst()
-        if filename.lower().endswith('.csv') and 'unverified' not in filename.lower()
-    ]
-
-def download_new_files(ftp, remote_dir, remote_files):
-    # Create local target directory and download new files
-    local_dir_target = os.path.join(LOCAL_BASE_DIR, remote_dir.lstrip('/'))
-    os.makedirs(local_dir_target, exist_ok=True)
-    local_files = os.listdir(local_dir_target)
+    try:
+        return {
+            filename: {"size": int(facts["size"]) if "size" in facts else None, "modify": facts.get("modify")}
+            for filename, facts in ftp.mlsd(facts=["type", "size", "modify"])
+            if facts.get("type", "file") == "file" and is_wanted_csv(filename)
+        }
+    except error_perm:
+        pass
 
-    downloaded_count = 0
-    for filename in remote_files:
+    listing = {}
+    filenames = [filename for filename in ftp.nlst() if is_wanted_csv(filename)]
+    # SIZE is only reliable in binary mode (NLST switches the session to ASCII)
+    ftp.voidcmd("TYPE I")
+    for filename in filenames:
+        try:
+            size = ftp.size(filename)
+        except error_perm:
+            size = None
+        try:
+            modify = ftp.voidcmd(f"MDTM {filename}").split()[-1]
+        except error_perm:
+            modify = None
+        listing[filename] = {"size": size, "modify": modify}
+    return listing
+
+def get_local_dir(remote_dir):
+    # Local mirror of a remote date directory
+    return os.path.join(LOCAL_BASE_DIR, remote_dir.lstrip('/'))
+
+def load_manifest(local_dir):
+    manifest_path = os.path.join(local_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(local_dir, manifest):
+    # Written to a temp file first so a killed run never leaves a corrupt manifest
+    manifest_path = os.path.join(local_dir, MANIFEST_NAME)
+    with open(manifest_path + PART_SUFFIX, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + PART_SUFFIX, manifest_path)
+
+def file_checksum(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def manifest_entry(remote, local_path):
+    return {"size": remote["size"], "modify": remote["modify"], "sha256": file_checksum(local_path)}
+
+def find_changed_files(local_dir, remote_listing, manifest):
+    # Compare the remote listing against the manifest, returns filenames that need a transfer
+    local_files = set(os.listdir(local_dir))
+    changed = []
+    for filename, remote in remote_listing.items():
+        local_path = os.path.join(local_dir, filename)
+        entry = manifest.get(filename)
         if filename not in local_files:
-            local_path = os.path.join(local_dir_target, filename)
-            with open(local_path, "wb") as f:
-                print(f"Downloading {filename} to {local_path}...")
-                ftp.retrbinary(f"RETR {filename}", f.write)
-            print(f"Downloaded: {filename}")
-            downloaded_count += 1
+            changed.append(filename)
+        elif entry is None:
+            # Downloaded before the manifest existed, adopt it if the size still matches
+            if remote["size"] is None or remote["size"] == os.path.getsize(local_path):
+                manifest[filename] = manifest_entry(remote, local_path)
+                print(f"Already exists: {filename}")
+            else:
+                changed.append(filename)
+        elif entry["size"] != remote["size"] or entry["modify"] != remote["modify"]:
+            # Re-published with corrected data, download_file discards a partial of the old version
+            print(f"Changed on server: {filename}")
+            changed.append(filename)
         else:
             print(f"Already exists: {filename}")
+    return changed
+
+def remove_partial(local_path):
+    for suffix in (PART_SUFFIX, PARTIAL_INFO_SUFFIX):
+        if os.path.exists(local_path + suffix):
+            os.remove(local_path + suffix)
+
+def partial_offset(local_path, remote):
+    # Bytes of a leftover temp file that can be resumed, 0 to start from scratch
+    # A partial is only resumed if it was started from the same remote size and modify time,
+    # otherwise Trackman re-published the file since and the old bytes are thrown away
+    part_path = local_path + PART_SUFFIX
+    info = {"size": remote["size"], "modify": remote["modify"]}
+    if os.path.exists(part_path):
+        try:
+            with open(local_path + PARTIAL_INFO_SUFFIX) as f:
+                started_from = json.load(f)
+        except (OSError, ValueError):
+            started_from = None
+        if started_from == info:
+            return os.path.getsize(part_path)
+        print(f"Discarding partial {part_path}, the remote file changed since it was started")
+        remove_partial(local_path)
+    with open(local_path + PARTIAL_INFO_SUFFIX, "w") as f:
+        json.dump(info, f)
+    return 0
+
+def download_file(ftp, filename, local_path, remote, retry=True):
+    # RETR a single file into a temp name and rename it once complete, returns bytes written
+    # remote: the file's listing entry ({"size", "modify"})
+    # A leftover temp file from an interrupted run is resumed from its byte offset (REST)
+    # if the remote file is unchanged since; a result that doesn't match the listed size is
+    # downloaded again from zero once, then reported as an error
+    # Reports the data channel's TLS handshake separately from the rest of the transfer
+    part_path = local_path + PART_SUFFIX
+    offset = partial_offset(local_path, remote)
+    start = time.perf_counter()
+
+    try:
+        with open(part_path, "ab") as f:
+            if offset:
+                print(f"Resuming {filename} at byte {offset} to {local_path}...")
+            else:
+                print(f"Downloading {filename} to {local_path}...")
+            ftp.retrbinary(f"RETR {filename}", f.write, rest=offset or None)
+            nbytes = f.tell() - offset
+    except error_perm:
+        if not offset:
+            raise
+        # Server rejected the offset (e.g. the remote file shrank), start over from zero
+        print(f"Resume rejected for {filename}, restarting download")
+        remove_partial(local_path)
+        return download_file(ftp, filename, local_path, remote)
+
+    size = os.path.getsize(part_path)
+    if remote["size"] is not None and size != remote["size"]:
+        remove_partial(local_path)
+        if not retry:
+            raise SizeMismatchError(f"{filename}: downloaded {size} bytes, server listed {remote['size']}")
+        print(f"Size mismatch for {filename} ({size} bytes, server listed {remote['size']}), restarting download")
+        return download_file(ftp, filename, local_path, remote, retry=False)
+
+    os.remove(local_path + PARTIAL_INFO_SUFFIX)
+    os.replace(part_path, local_path)
+    elapsed = time.perf_counter() - start
+    FILES_DOWNLOADED.inc()
+    BYTES_DOWNLOADED.inc(nbytes)
+    TRANSFER_SECONDS.observe(elapsed)
+    handshake = getattr(ftp, "last_handshake", 0.0)
+    resumed = " resumed" if getattr(ftp, "last_session_reused", False) else ""
+    print(f"Downloaded: {filename} (TLS handshake {handshake * 1000:.1f} ms{resumed}, "
+          f"transfer {(elapsed - handshake) * 1000:.1f} ms)")
+    return nbytes
+
+def download_failed(local_path, error):
+    DOWNLOAD_FAILURES.inc()
+    ingest_ledger.record_download_failure(LEDGER_PATH, local_path, error)
+
+def download_new_files(ftp, remote_dir, remote_listing):
+    # Create local target directory and download new or changed files
+    # Returns (local paths downloaded, files that failed on a size mismatch); other errors
+    # mean the session is unusable and are raised
+    local_dir_target = get_local_dir(remote_dir)
+    os.makedirs(local_dir_target, exist_ok=True)
+    manifest = load_manifest(local_dir_target)
+    pending = find_changed_files(local_dir_target, remote_listing, manifest)
+
+    downloaded = []
+    failed = []
+    try:
+        for filename in pending:
+            local_path = os.path.join(local_dir_target, filename)
+            try:
+                download_file(ftp, filename, local_path, remote_listing[filename])
+            except SizeMismatchError as e:
+                print(f"Failed: {e}")
+                download_failed(local_path, e)
+                failed.append(filename)
+                continue
+            except Exception as e:
+                download_failed(local_path, e)
+                raise
+            manifest[filename] = manifest_entry(remote_listing[filename], local_path)
+            ingest_ledger.record_download(LEDGER_PATH, local_path, manifest[filename]["sha256"])
+            downloaded.append(local_path)
+    finally:
+        save_manifest(local_dir_target, manifest)
+
+    return downloaded, failed
+
+def download_new_files_pooled(remote_dir, remote_listing, workers):
+    # Fan RETR requests for new or changed files across `workers` authenticated FTPS sessions
+    local_dir_target = get_local_dir(remote_dir)
+    os.makedirs(local_dir_target, exist_ok=True)
+    manifest = load_manifest(local_dir_target)
+
+    pending = queue.Queue()
+    for filename in find_changed_files(local_dir_target, remote_listing, manifest):
+        pending.put(filename)
+    if pending.empty():
+        save_manifest(local_dir_target, manifest)
+        return 0
+
+    lock = threading.Lock()
+    totals = {"files": 0, "bytes": 0}
+    failures = []
+    connect_errors = []
+
+    def worker():
+        # Each worker owns one session and pulls filenames until the queue drains
+        # A session that can't connect leaves its share of the queue to the others
+        ftp = None
+        try:
+            ftp = connect_ftp_tls()
+            ftp.cwd(remote_dir)
+        except all_errors as e:
+            print(f"Could not open an FTPS session: {e}")
+            if ftp is not None:
+                ftp.close()
+            with lock:
+                connect_errors.append(e)
+            return
+        try:
+            while True:
+                try:
+                    filename = pending.get_nowait()
+                except queue.Empty:
+                    return
+                local_path = os.path.join(local_dir_target, filename)
+                try:
+                    nbytes = download_file(ftp, filename, local_path, remote_listing[filename])
+                    entry = manifest_entry(remote_listing[filename], local_path)
+                    ingest_ledger.record_download(LEDGER_PATH, local_path, entry["sha256"])
+                except Exception as e:
+                    # The partial temp file is kept so the next run resumes it
+                    download_failed(local_path, e)
+                    with lock:
+                        failures.append(f"{filename}: {e}")
+                    continue
+                with lock:
+                    manifest[filename] = entry
+                    totals["files"] += 1
+                    totals["bytes"] += nbytes
+        finally:
+            try:
+                ftp.quit()
+            except all_errors:
+                ftp.close()
+
+    session_count = min(workers, pending.qsize())
+    print(f"Downloading {pending.qsize()} file(s) over {session_count} FTPS session(s)...")
+    start_time = time.time()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(session_count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start_time
+    save_manifest(local_dir_target, manifest)
+
+    # Files left in the queue had no session to fetch them
+    while not pending.empty():
+        filename = pending.get_nowait()
+        error = connect_errors[-1] if connect_errors else "worker stopped"
+        download_failed(os.path.join(local_dir_target, filename), error)
+        failures.append(f"{filename}: no FTPS session ({error})")
+
+    mb = totals["bytes"] / 1024 / 1024
+    rate = mb / elapsed if elapsed > 0 else 0.0
+    print(f"Pooled download: {totals['files']} file(s), {mb:.2f}MB in {elapsed:.2f} sec ({rate:.2f} MB/sec)")
+    for failure in failures:
+        print(f"Failed: {failure}")
+    if len(connect_errors) == session_count:
+        # Not an error_perm even for a rejected login, which callers would take for a missing folder
+        raise ConnectionError(f"no FTPS session could be opened: {connect_errors[0]}") from connect_errors[0]
 
-    return downloaded_count
+    return totals["files"]
 
 def write_log(message):
     # Append log to file
@@ -65,24 +385,349 @@ def write_log(message):
     with open(log_path, "a") as log:
         log.write(f"{datetime.now()}: {message}\n")
 
-def main():
+def sync_day(ftp, remote_dir, workers):
+    # List one remote date directory and download new or changed files, returns a log message
+    remote_csvs = list_remote_csvs(ftp, remote_dir)
+    if not remote_csvs:
+        log_message = "No CSV files found on server."
+        print(log_message)
+        return log_message
+
+    failed = []
+    if workers > 1:
+        downloaded = download_new_files_pooled(remote_dir, remote_csvs, workers)
+    else:
+        downloaded, failed = download_new_files(ftp, remote_dir, remote_csvs)
+        downloaded = len(downloaded)
+    if downloaded == 0 and not failed:
+        return "No new or changed files on server."
+    message = f"Downloaded {downloaded} new or changed file(s)."
+    return message + (f" {len(failed)} failed." if failed else "")
+
+def sync_day_range(days, workers, day_workers):
+    # Backfill: at most `day_workers` days in flight, each day-worker thread keeps one
+    # control connection open across all the date directories it handles
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+
+    def run(day):
+        remote_dir = get_remote_dir(day)
+        if getattr(local, "ftp", None) is None:
+            local.ftp = connect_ftp_tls()
+            with sessions_lock:
+                sessions.append(local.ftp)
+        try:
+            return sync_day(local.ftp, remote_dir, workers)
+        except error_perm as e:
+            # No games that day, the date folder doesn't exist
+            return f"Skipped, folder not available: {e}"
+        except all_errors:
+            # Broken session, the thread's next day reconnects
+            local.ftp.close()
+            local.ftp = None
+            raise
+
+    print(f"Backfilling {len(days)} day(s), {day_workers} at a time...")
+    try:
+        with ThreadPoolExecutor(max_workers=day_workers) as pool:
+            futures = {pool.submit(run, day): get_remote_dir(day) for day in days}
+            for future in as_completed(futures):
+                remote_dir = futures[future]
+                try:
+                    log_message = future.result()
+                except Exception as e:
+                    log_message = f"Error: {e}"
+                print(f"{remote_dir}: {log_message}")
+                write_log(f"{remote_dir}: {log_message}")
+    finally:
+        for ftp in sessions:
+            try:
+                ftp.quit()
+            except all_errors:
+                ftp.close()
+
+def fetch_file(ftp, remote_dir, filename, local_path, remote):
+    # Blocking download plus manifest and ledger bookkeeping, run in a worker thread by the
+    # async engine; the full remote path lets one session serve any directory
+    try:
+        nbytes = download_file(ftp, f"{remote_dir}/{filename}", local_path, remote)
+        entry = manifest_entry(remote, local_path)
+        ingest_ledger.record_download(LEDGER_PATH, local_path, entry["sha256"])
+    except Exception as e:
+        download_failed(local_path, e)
+        raise
+    return nbytes, entry
+
+async def sync_days_async(days, concurrency):
+    # Async engine: every day's listing and every file transfer is scheduled from one event loop,
+    # with at most `concurrency` ftplib calls running at once, each in a worker thread on a
+    # pooled FTPS session, so multi-day catch-ups keep the link busy across directories
+    semaphore = asyncio.Semaphore(concurrency)
+    idle = []
+    totals = {"files": 0, "bytes": 0}
+
+    async def connect():
+        # A rejected login is an error_perm too, which sync() would take for a missing folder
+        try:
+            return await asyncio.to_thread(connect_ftp_tls)
+        except error_perm as e:
+            raise ConnectionError(f"login failed: {e}") from e
+
+    async def run_ftp(func, *args):
+        # Run func(ftp, *args) on an idle session, connecting a new one while under the limit
+        async with semaphore:
+            ftp = idle.pop() if idle else await connect()
+            try:
+                result = await asyncio.to_thread(func, ftp, *args)
+            except (error_perm, SizeMismatchError):
+                # The server refused the command or sent a bad file, the session itself is fine
+                idle.append(ftp)
+                raise
+            except all_errors:
+                ftp.close()
+                raise
+            idle.append(ftp)
+            return result
+
+    async def sync(remote_dir):
+        try:
+            remote_csvs = await run_ftp(list_remote_csvs, remote_dir)
+        except error_perm as e:
+            # No games that day, the date folder doesn't exist
+            return f"Skipped, folder not available: {e}"
+        if not remote_csvs:
+            return "No CSV files found on server."
+
+        local_dir = get_local_dir(remote_dir)
+        os.makedirs(local_dir, exist_ok=True)
+        manifest = load_manifest(local_dir)
+        pending = find_changed_files(local_dir, remote_csvs, manifest)
+        results = await asyncio.gather(
+            *(run_ftp(fetch_file, remote_dir, filename, os.path.join(local_dir, filename), remote_csvs[filename])
+              for filename in pending),
+            return_exceptions=True)
+
+        # Results are applied on the event loop thread, so the manifest needs no lock
+        failures = 0
+        for filename, result in zip(pending, results):
+            if isinstance(result, Exception):
+                print(f"Failed: {remote_dir}/{filename}: {result}")
+                failures += 1
+                continue
+            nbytes, entry = result
+            manifest[filename] = entry
+            totals["files"] += 1
+            totals["bytes"] += nbytes
+        save_manifest(local_dir, manifest)
+
+        if not pending:
+            return "No new or changed files on server."
+        message = f"Downloaded {len(pending) - failures} new or changed file(s)."
+        return message + (f" {failures} failed." if failures else "")
+
+    remote_dirs = [get_remote_dir(day) for day in days]
+    print(f"Syncing {len(remote_dirs)} day(s) with up to {concurrency} concurrent transfers...")
+    start_time = time.time()
+    # The first session connects up front, so bad credentials stop the run like the threads engine
+    idle.append(await asyncio.to_thread(connect_ftp_tls))
+    try:
+        results = await asyncio.gather(*(sync(remote_dir) for remote_dir in remote_dirs), return_exceptions=True)
+    finally:
+        for ftp in idle:
+            try:
+                ftp.quit()
+            except all_errors:
+                ftp.close()
+    elapsed = time.time() - start_time
+
+    for remote_dir, result in zip(remote_dirs, results):
+        log_message = f"Error: {result}" if isinstance(result, Exception) else result
+        print(f"{remote_dir}: {log_message}")
+        write_log(f"{remote_dir}: {log_message}")
+    mb = totals["bytes"] / 1024 / 1024
+    rate = mb / elapsed if elapsed > 0 else 0.0
+    print(f"Async download: {totals['files']} file(s), {mb:.2f}MB in {elapsed:.2f} sec ({rate:.2f} MB/sec)")
+
+def keepalive_sleep(ftp, seconds, keepalive):
+    # Wait between polls, sending NOOP every `keepalive` seconds so the server doesn't
+    # drop the idle control connection
+    deadline = time.monotonic() + seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(keepalive, remaining))
+        if time.monotonic() < deadline:
+            ftp.voidcmd("NOOP")
+
+def export_metrics(metrics_dir):
+    # Stamp the run and, with a textfile directory, rewrite ftp_csv_downloader.prom there
+    LAST_RUN.set(time.time())
+    if metrics_dir:
+        pipeline_metrics.write_textfile(metrics_dir, "ftp_csv_downloader")
+
+def watched_dirs(now, grace_hours):
+    # Today's folder, plus yesterday's for the first grace_hours after midnight so late games
+    # still get their final re-publish
+    days = [now]
+    if now.hour < grace_hours:
+        days.insert(0, now - timedelta(days=1))
+    return [get_remote_dir(day) for day in days]
+
+def watch(interval, keepalive, ingest, metrics_dir=None, metrics_port=None, grace_hours=3):
+    # Poll today's folder (and yesterday's until grace_hours after midnight) until interrupted,
+    # downloading new or changed files as they appear
+    # A poll whose listing matches the previous one costs a single MLSD and touches nothing locally
+    # With ingest, new files go straight to the database through csv_to_db in merge mode,
+    # since Trackman re-publishes a game's file with more pitches while it is in progress
+    # Metrics are exported after every poll, and served on metrics_port if given
+    if metrics_port:
+        pipeline_metrics.serve(metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{metrics_port}/metrics")
+    if ingest:
+        # Imported here so plain downloads don't need pandas or the database driver
+        import csv_to_db
+        csv_to_db.setup_logging()
+        table = os.getenv("DB_TABLE")
+        engine = csv_to_db.create_db_engine()
+
+    print(f"Watching today's folder every {interval} sec (Ctrl+C to stop)...")
+    ftp = connect_ftp_tls()
+    last_listing = {}
+
+    def poll(remote_dir):
+        try:
+            remote_csvs = list_remote_csvs(ftp, remote_dir)
+        except error_perm as e:
+            # Today's folder doesn't exist until the first game is published
+            print(f"{remote_dir}: not available yet ({e})")
+            return
+        if remote_csvs == last_listing.get(remote_dir):
+            return
+        downloaded, failed = download_new_files(ftp, remote_dir, remote_csvs)
+        if not failed:
+            # Otherwise the next poll lists again and retries the failed files
+            last_listing[remote_dir] = remote_csvs
+        if downloaded:
+            write_log(f"{remote_dir}: Downloaded {len(downloaded)} new or changed file(s).")
+            if ingest:
+                rows = csv_to_db.process_files(downloaded, table, engine, load_mode='merge',
+                                               ledger_path=LEDGER_PATH)
+                print(f"Ingested {len(downloaded)} file(s), {rows} rows")
+
+    try:
+        while True:
+            # Errors are handled around the poll and the wait separately, so a session dropped
+            # while idle goes through the same reconnect as one dropped mid-poll
+            try:
+                if ftp is None:
+                    ftp = connect_ftp_tls()
+                remote_dirs = watched_dirs(datetime.now(), grace_hours)
+                for remote_dir in remote_dirs:
+                    poll(remote_dir)
+                last_listing = {remote_dir: last_listing[remote_dir]
+                                for remote_dir in remote_dirs if remote_dir in last_listing}
+            except error_perm as e:
+                if ftp is None:
+                    # Rejected login while reconnecting
+                    raise
+                print(f"Poll failed: {e}")
+            except all_errors as e:
+                print(f"Connection lost ({e}), reconnecting on the next poll")
+                if ftp is not None:
+                    ftp.close()
+                ftp = None
+            export_metrics(metrics_dir)
+
+            try:
+                if ftp is None:
+                    time.sleep(interval)
+                else:
+                    keepalive_sleep(ftp, interval, keepalive)
+            except all_errors as e:
+                print(f"Connection lost while idle ({e}), reconnecting on the next poll")
+                ftp.close()
+                ftp = None
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        if ftp is not None:
+            try:
+                ftp.quit()
+            except all_errors:
+                pass
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download Trackman CSVs from the FTP server")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of parallel FTPS sessions used for downloads (default: 1, serial)")
+    parser.add_argument("--start", type=parse_date,
+                        help="Backfill from this date (YYYY-MM-DD) instead of yesterday")
+    parser.add_argument("--end", type=parse_date,
+                        help="Last date of the backfill, inclusive (YYYY-MM-DD, default: yesterday)")
+    parser.add_argument("--day-workers", type=int, default=4,
+                        help="Number of days processed concurrently in backfill mode (default: 4)")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="threads: session pool per day (--workers, --day-workers); async: one event loop "
+                             "schedules all listings and transfers (--concurrency) (default: threads)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="FTP listings and transfers in flight at once with --engine async (default: 8)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep polling today's folder and download files as they are published")
+    parser.add_argument("--interval", type=int, default=60,
+                        help="Seconds between polls in watch mode (default: 60)")
+    parser.add_argument("--keepalive", type=int, default=30,
+                        help="Seconds between NOOPs on the idle session in watch mode (default: 30)")
+    parser.add_argument("--grace-hours", type=int, default=3,
+                        help="In watch mode, keep polling yesterday's folder this many hours after midnight "
+                             "for late games (default: 3)")
+    parser.add_argument("--ingest", action="store_true",
+                        help="In watch mode, load new files into the database with csv_to_db right away")
+    parser.add_argument("--metrics-dir", default=os.getenv("METRICS_TEXTFILE_DIR"),
+                        help="Write Prometheus metrics to ftp_csv_downloader.prom here for node-exporter's "
+                             "textfile collector (default: $METRICS_TEXTFILE_DIR, unset disables it)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="In watch mode, also serve Prometheus metrics on this local port")
+    args = parser.parse_args()
+    if args.metrics_port and not args.watch:
+        parser.error("--metrics-port requires --watch")
+    if args.watch and args.start:
+        parser.error("--watch cannot be combined with --start/--end")
+    if args.ingest and not args.watch:
+        parser.error("--ingest requires --watch")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.interval < 1 or args.keepalive < 1:
+        parser.error("--interval and --keepalive must be at least 1")
+    if not 0 <= args.grace_hours <= 24:
+        parser.error("--grace-hours must be between 0 and 24")
+    if args.end and not args.start:
+        parser.error("--end requires --start")
+    if args.start:
+        args.end = args.end or datetime.now() - timedelta(days=1)
+        if args.end < args.start:
+            parser.error("--end must not be before --start")
+    return args
+
+def run(args):
+    # One run: async engine, backfill range or yesterday's folder
+    if args.engine == "async":
+        days = date_range(args.start, args.end) if args.start else [datetime.now() - timedelta(days=1)]
+        asyncio.run(sync_days_async(days, args.concurrency))
+        return
+
+    if args.start:
+        sync_day_range(date_range(args.start, args.end), args.workers, args.day_workers)
+        return
+
     remote_dir = get_yesterday_remote_dir()
     print(f"Targeting FTP folder: {remote_dir}")
 
     ftp = connect_ftp_tls()
-    downloaded = 0
 
     try:
-        remote_csvs = list_remote_csvs(ftp, remote_dir)
-        if not remote_csvs:
-            log_message = "No CSV files found on server."
-            print(log_message)
-        else:
-            downloaded = download_new_files(ftp, remote_dir, remote_csvs)
-            if downloaded == 0:
-                log_message = "Files already exist. No new downloads."
-            else:
-                log_message = f"Downloaded {downloaded} new file(s)."
+        log_message = sync_day(ftp, remote_dir, args.workers)
     except Exception as e:
         log_message = f"Error: {e}"
         print(log_message)
@@ -91,5 +736,16 @@ def main():
 
     write_log(log_message)
 
+def main():
+    args = parse_args()
+    if args.watch:
+        watch(args.interval, args.keepalive, args.ingest, args.metrics_dir, args.metrics_port, args.grace_hours)
+        return
+
+    try:
+        run(args)
+    finally:
+        export_metrics(args.metrics_dir)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,159 @@
+## === ftp_to_db === ##
+# Streaming mode: Trackman FTP server straight to the database, without the local CSV hop
+# Each CSV is RETR'd into memory, parsed and cleaned as soon as its transfer finishes, and
+# inserted while the next file streams, so games land minutes after Trackman publishes them
+# --archive also saves every streamed file under LOCAL_BASE_DIR as ftp_csv_downloader.py would
+
+import io
+import os
+import argparse
+import hashlib
+import logging
+import time
+from ftplib import error_perm
+from datetime import datetime, timedelta
+import ftp_csv_downloader
+import csv_to_db
+import ingest_ledger
+import pipeline_metrics
+import trackman_schema
+
+def stream_file(ftp, filename):
+    # RETR one file into an in-memory buffer, returns its bytes
+    buffer = io.BytesIO()
+    ftp.retrbinary(f"RETR {filename}", buffer.write)
+    return buffer.getvalue()
+
+def archive_file(local_path, data):
+    # Same temp-name-then-rename as the downloader, so csv_to_db.py never sees a partial file
+    with open(local_path + ftp_csv_downloader.PART_SUFFIX, "wb") as f:
+        f.write(data)
+    os.replace(local_path + ftp_csv_downloader.PART_SUFFIX, local_path)
+
+def stream_day(ftp, remote_dir, table, engine, archive=False, **options):
+    # Stream one remote date directory into the database, returns (files, rows)
+    # Without archive every listed file is streamed, so re-runs rely on --load-mode merge or --dedup
+    # With archive, files unchanged since the local manifest are left out and outcomes go to the ledger
+    # options are passed through to csv_to_db.process_files
+    remote_csvs = ftp_csv_downloader.list_remote_csvs(ftp, remote_dir)
+    if archive:
+        local_dir = ftp_csv_downloader.get_local_dir(remote_dir)
+        os.makedirs(local_dir, exist_ok=True)
+        manifest = ftp_csv_downloader.load_manifest(local_dir)
+        filenames = ftp_csv_downloader.find_changed_files(local_dir, remote_csvs, manifest)
+        file_paths = {os.path.join(local_dir, filename): filename for filename in filenames}
+        options["ledger_path"] = ftp_csv_downloader.LEDGER_PATH
+    else:
+        file_paths = {f"{remote_dir}/{filename}": filename for filename in sorted(remote_csvs)}
+    if not file_paths:
+        logging.info(f"No new or changed CSV files in {remote_dir}")
+        return 0, 0
+
+    transfer = {"bytes": 0, "seconds": 0.0}
+
+    def fetch(file_path):
+        # Runs on process_files' parser thread, the only user of this session while the day streams
+        filename = file_paths[file_path]
+        start = time.perf_counter()
+        data = stream_file(ftp, filename)
+        seconds = time.perf_counter() - start
+        transfer["seconds"] += seconds
+        transfer["bytes"] += len(data)
+        ftp_csv_downloader.FILES_DOWNLOADED.inc()
+        ftp_csv_downloader.BYTES_DOWNLOADED.inc(len(data))
+        ftp_csv_downloader.TRANSFER_SECONDS.observe(seconds)
+        if archive:
+            archive_file(file_path, data)
+            checksum = hashlib.sha256(data).hexdigest()
+            manifest[filename] = {**remote_csvs[filename], "sha256": checksum}
+            ingest_ledger.record_download(ftp_csv_downloader.LEDGER_PATH, file_path, checksum)
+        return data
+
+    start_time = time.time()
+    try:
+        total_rows = csv_to_db.process_files(list(file_paths), table, engine, pool=None, fetch=fetch, **options)
+    finally:
+        if archive:
+            ftp_csv_downloader.save_manifest(local_dir, manifest)
+    elapsed = time.time() - start_time
+
+    mb = transfer["bytes"] / 1024 / 1024
+    rate = mb / transfer["seconds"] if transfer["seconds"] > 0 else 0.0
+    logging.info(f"Streamed {len(file_paths)} files, {mb:.2f}MB in {transfer['seconds']:.2f} sec ({rate:.2f} MB/sec)")
+    logging.info(f"Complete: {remote_dir} {len(file_paths)} files, {total_rows} rows in {elapsed:.2f} sec")
+    return len(file_paths), total_rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream Trackman CSVs from the FTP server straight into the database")
+    parser.add_argument("--start", type=ftp_csv_downloader.parse_date,
+                        help="Stream from this date (YYYY-MM-DD) instead of yesterday")
+    parser.add_argument("--end", type=ftp_csv_downloader.parse_date,
+                        help="Last date to stream, inclusive (YYYY-MM-DD, default: yesterday)")
+    parser.add_argument("--archive", action="store_true",
+                        help="Also save streamed files under LOCAL_BASE_DIR and skip files unchanged since the last run")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="Parsed files allowed to wait for the database writer (default: 4)")
+    parser.add_argument("--batch-rows", type=int, default=0,
+                        help="Combine rows from several files into one insert of about this many rows "
+                             "(default: 0, one insert per file)")
+    parser.add_argument("--load-mode", choices=["append", "merge"], default="append",
+                        help="append: insert straight into DB_TABLE; merge: bulk-load a staging table and "
+                             "insert only new RowIDs (default: append)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Load existing RowIDs for the target dates once and only send new pitches")
+    parser.add_argument("--schema", choices=sorted(trackman_schema.SCHEMAS), default=trackman_schema.CURRENT_VERSION,
+                        help=f"Trackman column schema used to type columns (default: {trackman_schema.CURRENT_VERSION})")
+    parser.add_argument("--reader", choices=csv_to_db.READ_ENGINES, default="pandas-c",
+                        help="CSV reader engine; pyarrow and arrow-stream need the pyarrow package (default: pandas-c)")
+    parser.add_argument("--metrics-dir", default=os.getenv("METRICS_TEXTFILE_DIR"),
+                        help="Write Prometheus metrics to ftp_to_db.prom here for node-exporter's textfile "
+                             "collector (default: $METRICS_TEXTFILE_DIR, unset disables it)")
+    args = parser.parse_args()
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    if args.end and not args.start:
+        parser.error("--end requires --start")
+    args.start = args.start or datetime.now() - timedelta(days=1)
+    args.end = args.end or max(args.start, datetime.now() - timedelta(days=1))
+    if args.end < args.start:
+        parser.error("--end must not be before --start")
+    return args
+
+def main():
+    args = parse_args()
+    csv_to_db.setup_logging()
+    table = os.getenv("DB_TABLE")
+    engine = csv_to_db.create_db_engine()
+    options = {
+        "max_pending": args.queue_size,
+        "batch_rows": args.batch_rows,
+        "load_mode": args.load_mode,
+        "schema": args.schema,
+        "reader": args.reader,
+    }
+
+    # One FTPS session serves every day, streaming one file at a time ahead of the writer
+    ftp = ftp_csv_downloader.connect_ftp_tls()
+    try:
+        if args.dedup:
+            options["known_rowids"] = csv_to_db.load_existing_rowids(engine, table, args.start, args.end)
+            logging.info(f"Loaded {len(options['known_rowids'])} existing RowIDs for dedup")
+
+        for day in ftp_csv_downloader.date_range(args.start, args.end):
+            remote_dir = ftp_csv_downloader.get_remote_dir(day)
+            try:
+                stream_day(ftp, remote_dir, table, engine, archive=args.archive, **options)
+            except error_perm as e:
+                # No games that day, the date folder doesn't exist
+                logging.info(f"Skipped {remote_dir}, folder not available: {e}")
+
+    except Exception as e:
+        logging.error(f"Fatal error: {e}")
+    finally:
+        ftp.quit()
+        csv_to_db.LAST_RUN.set(time.time())
+        if args.metrics_dir:
+            pipeline_metrics.write_textfile(args.metrics_dir, "ftp_to_db")
+
+if __name__ == "__main__":
+    main()
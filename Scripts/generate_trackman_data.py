@@ -0,0 +1,121 @@
+## === generate_trackman_data === ##
+# Synthetic Trackman play-by-play CSVs for benchmarks and local testing, no real data needed
+# Writes <out>/v3/YYYY/MM/DD/CSV/ like the FTP server and LOCAL_BASE_DIR, with a mix of D1 and
+# non-D1 games, _unverified copies and player positioning files the pipeline has to skip
+# Output is deterministic for a given --seed
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import trackman_schema
+
+NON_D1_LEVELS = ("D2", "D3", "NAIA")
+
+def game_csv(rows, columns=170, date="2025-03-14", game_id="20250314-Field-1", level="D1", seed=0):
+    # One game's CSV text: the declared v3 columns, padded with numbered trajectory columns up
+    # to `columns`, pitches in order through nine innings, ~10% blanks in nullable columns
+    rng = np.random.default_rng(seed)
+    names = list(trackman_schema.V3_COLUMNS)
+    for n in range(columns - len(names)):
+        names.append(f"HitTrajectory{'XYZ'[n % 3]}c{n // 3}")
+
+    pitch = np.arange(rows)
+    # First pitch around 13:00, then one every ~20 seconds with hundredths like the real export
+    seconds = 13 * 3600 + pitch * 20 + rng.integers(0, 10, rows)
+    half_inning = pitch * 18 // max(rows, 1)
+    fixed = {
+        "PitchNo": pitch + 1,
+        "Date": np.full(rows, date),
+        "Time": [f"{s // 3600}:{s // 60 % 60:02d}:{s % 60:02d}.{h:02d}"
+                 for s, h in zip(seconds, rng.integers(0, 100, rows))],
+        "GameID": np.full(rows, game_id),
+        "Level": np.full(rows, level),
+        "Inning": half_inning // 2 + 1,
+        "Top/Bottom": np.where(half_inning % 2 == 0, "Top", "Bottom"),
+        "Outs": rng.integers(0, 3, rows),
+        "Balls": rng.integers(0, 4, rows),
+        "Strikes": rng.integers(0, 3, rows),
+    }
+
+    data = {}
+    for name in names[:columns]:
+        spec = trackman_schema.column_spec(name)
+        if name in fixed:
+            values = fixed[name]
+        elif spec["dtype"] == trackman_schema.CATEGORY:
+            values = rng.choice([f"{name}_{k}" for k in range(12)], rows)
+        elif spec["dtype"] == trackman_schema.TEXT:
+            values = [f"{name}-{game_id}-{i}" for i in range(rows)]
+        elif spec["dtype"].lower().startswith("int"):
+            values = rng.integers(0, 10, rows)
+        else:
+            values = rng.normal(0, 50, rows).round(4)
+        series = pd.Series(values)
+        if spec["nullable"] and name not in fixed:
+            series = series.astype(object).mask(rng.random(rows) < 0.1)
+        data[name] = series
+    return pd.DataFrame(data).to_csv(index=False)
+
+def positioning_csv(rows, game_id, seed=0):
+    # Player positioning export: a different layout the pipeline must skip by name
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "GameID": game_id,
+        "PlayID": [f"{game_id}-{i}" for i in range(rows)],
+        "Position": rng.choice(["P", "C", "1B", "2B", "3B", "SS", "LF", "CF", "RF"], rows),
+        "PositionX": rng.normal(0, 100, rows).round(3),
+        "PositionZ": rng.normal(0, 100, rows).round(3),
+    }).to_csv(index=False)
+
+def generate(out_dir, start, days=1, games=8, rows=300, columns=170, d1_share=0.75,
+             unverified_share=0.1, positioning_share=0.25, seed=0):
+    # Write `games` games for each of `days` days from `start`, returns the paths written
+    rng = np.random.default_rng(seed)
+    written = []
+
+    def write(path, text):
+        with open(path, "w", newline="") as f:
+            f.write(text)
+        written.append(path)
+
+    for day in (start + timedelta(days=n) for n in range(days)):
+        day_dir = os.path.join(out_dir, "v3", str(day.year), day.strftime('%m'), day.strftime('%d'), "CSV")
+        os.makedirs(day_dir, exist_ok=True)
+        for game in range(1, games + 1):
+            game_id = f"{day.strftime('%Y%m%d')}-Field{game}-1"
+            level = "D1" if rng.random() < d1_share else str(rng.choice(NON_D1_LEVELS))
+            text = game_csv(rows, columns, day.strftime('%Y-%m-%d'), game_id, level, seed=int(rng.integers(2**32)))
+            write(os.path.join(day_dir, f"{game_id}.csv"), text)
+            if rng.random() < unverified_share:
+                write(os.path.join(day_dir, f"{game_id}_unverified.csv"), text)
+            if rng.random() < positioning_share:
+                write(os.path.join(day_dir, f"{game_id}_playerpositioning_FHC.csv"),
+                      positioning_csv(rows, game_id, seed=int(rng.integers(2**32))))
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Trackman CSVs in the FTP/LOCAL_BASE_DIR layout")
+    parser.add_argument("--out", required=True, help="Root to write v3/YYYY/MM/DD/CSV folders under")
+    parser.add_argument("--start", type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        default=datetime(2025, 3, 14), help="First game date (YYYY-MM-DD, default: 2025-03-14)")
+    parser.add_argument("--days", type=int, default=1, help="Number of days (default: 1)")
+    parser.add_argument("--games", type=int, default=8, help="Games per day (default: 8)")
+    parser.add_argument("--rows", type=int, default=300, help="Pitches per game (default: 300)")
+    parser.add_argument("--columns", type=int, default=170, help="Columns per game file (default: 170)")
+    parser.add_argument("--d1-share", type=float, default=0.75, help="Share of games at D1 level (default: 0.75)")
+    parser.add_argument("--unverified-share", type=float, default=0.1,
+                        help="Share of games that also get an _unverified copy (default: 0.1)")
+    parser.add_argument("--positioning-share", type=float, default=0.25,
+                        help="Share of games that also get a player positioning file (default: 0.25)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    written = generate(args.out, args.start, args.days, args.games, args.rows, args.columns,
+                       args.d1_share, args.unverified_share, args.positioning_share, args.seed)
+    size = sum(os.path.getsize(path) for path in written)
+    print(f"Wrote {len(written)} files ({size / 1024 / 1024:.2f}MB) under {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+## === ingest_ledger === ##
+# Embedded SQLite ledger of every file the pipeline has handled
+# ftp_csv_downloader.py records downloads and csv_to_db.py records uploads, so each run
+# only acts on new, changed or failed files and an interrupted upload resumes where it stopped
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+# Upload statuses that need no more work while the file is unchanged
+FINISHED = ("inserted", "skipped")
+
+def default_path(local_base_dir):
+    # INGEST_LEDGER overrides the default location next to the downloaded data
+    return os.getenv("INGEST_LEDGER") or os.path.join(local_base_dir or ".", "ingest_ledger.sqlite")
+
+@contextmanager
+def open_ledger(ledger_path):
+    # One short-lived connection and transaction per call; WAL lets download threads,
+    # backfill days and the uploader write concurrently
+    conn = sqlite3.connect(ledger_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                sha256 TEXT,
+                downloaded_at TEXT,
+                rows_parsed INTEGER,
+                rows_inserted INTEGER,
+                status TEXT,
+                error TEXT,
+                updated_at TEXT
+            )
+            """)
+            yield conn
+    finally:
+        conn.close()
+
+def record_download(ledger_path, path, sha256):
+    # A (re-)downloaded file always needs uploading, so upload results are reset
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    now = datetime.now().isoformat(timespec='seconds')
+    with open_ledger(ledger_path) as conn:
+        conn.execute("""
+            INSERT INTO files (path, size, mtime, sha256, downloaded_at, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'downloaded', ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size, mtime = excluded.mtime, sha256 = excluded.sha256,
+                downloaded_at = excluded.downloaded_at, status = 'downloaded',
+                rows_parsed = NULL, rows_inserted = NULL, error = NULL, updated_at = excluded.updated_at
+        """, (path, stat.st_size, stat.st_mtime, sha256, now, now))
+
+def record_download_failure(ledger_path, path, error):
+    path = os.path.abspath(path)
+    now = datetime.now().isoformat(timespec='seconds')
+    with open_ledger(ledger_path) as conn:
+        conn.execute("""
+            INSERT INTO files (path, status, error, updated_at) VALUES (?, 'download_failed', ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                status = 'download_failed', error = excluded.error, updated_at = excluded.updated_at
+        """, (path, str(error), now))
+
+def record_upload(ledger_path, path, status, rows_parsed=None, rows_inserted=None, error=None):
+    # status: inserted, skipped (non-D1 or nothing new) or failed
+    # A streamed file whose transfer failed may not exist locally, its size and mtime stay unknown
+    path = os.path.abspath(path)
+    stat = os.stat(path) if os.path.exists(path) else None
+    now = datetime.now().isoformat(timespec='seconds')
+    with open_ledger(ledger_path) as conn:
+        conn.execute("""
+            INSERT INTO files (path, size, mtime, rows_parsed, rows_inserted, status, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size, mtime = excluded.mtime, rows_parsed = excluded.rows_parsed,
+                rows_inserted = excluded.rows_inserted, status = excluded.status,
+                error = excluded.error, updated_at = excluded.updated_at
+        """, (path, stat and stat.st_size, stat and stat.st_mtime, rows_parsed, rows_inserted, status,
+              str(error) if error is not None else None, now))
+
+def pending_uploads(ledger_path, paths):
+    # Paths that are new to the ledger, changed on disk since their upload, or not finished
+    pending = []
+    with open_ledger(ledger_path) as conn:
+        for path in paths:
+            row = conn.execute("SELECT size, mtime, status FROM files WHERE path = ?",
+                               (os.path.abspath(path),)).fetchone()
+            if row is None or row[2] not in FINISHED:
+                pending.append(path)
+                continue
+            stat = os.stat(path)
+            if (row[0], row[1]) != (stat.st_size, stat.st_mtime):
+                pending.append(path)
+    return pending
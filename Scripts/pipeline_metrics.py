@@ -0,0 +1,208 @@
+## === pipeline_metrics === ##
+# Per-file and per-stage timings for csv_to_db.py, written as JSON lines next to the run's log
+# Every file gets one line with its stage seconds, rows/sec and MB/sec, and the run ends with a
+# summary line holding count, total, p50 and p95 for each stage, to compare nightly runs
+# Also a small Prometheus registry (counters, gauges, histograms) both scripts export through a
+# node-exporter textfile or, in watch mode, a local HTTP endpoint
+
+import os
+import json
+import math
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# list: finding a day's CSVs; read: CSV (or Parquet cache) to frame; filter: Level check on the
+# first row; clean: clean_data; insert: rows sent to the database; commit: the transaction commit
+STAGES = ("list", "read", "filter", "clean", "insert", "commit")
+
+def percentile(values, pct):
+    # Nearest-rank percentile of a non-empty list
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def per_second(amount, seconds):
+    return round(amount / seconds, 2) if seconds > 0 else None
+
+class StageMetrics:
+    # Collects stage samples for one run and appends JSON lines to `path`
+    # Backfill days share one instance from several threads, so writes are locked
+
+    def __init__(self, path):
+        self.path = path
+        self.samples = {stage: [] for stage in STAGES}
+        self.totals = {"files": 0, "rows": 0, "bytes": 0}
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        record = {"ts": datetime.now().isoformat(timespec='milliseconds'), **record}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def record_stage(self, stage, seconds, **fields):
+        # A stage not tied to one file, e.g. listing a day folder
+        with self.lock:
+            self.samples[stage].append(seconds)
+            self.write({"event": "stage", "stage": stage, "seconds": round(seconds, 6), **fields})
+
+    def record_file(self, file_path, status, seconds, rows=0, nbytes=0):
+        # seconds: {stage: seconds} for the stages this file went through
+        elapsed = sum(seconds.values())
+        with self.lock:
+            for stage, value in seconds.items():
+                self.samples[stage].append(value)
+            self.totals["files"] += 1
+            self.totals["rows"] += rows
+            self.totals["bytes"] += nbytes
+            self.write({
+                "event": "file", "file": file_path, "status": status, "rows": rows, "bytes": nbytes,
+                "seconds": {stage: round(value, 6) for stage, value in seconds.items()},
+                "rows_per_sec": per_second(rows, elapsed),
+                "mb_per_sec": per_second(nbytes / 1024 / 1024, elapsed),
+            })
+
+    def summary(self, elapsed):
+        # Writes and returns the run summary: totals, throughput over wall time and per-stage stats
+        with self.lock:
+            stages = {
+                stage: {"count": len(values), "total": round(sum(values), 6),
+                        "p50": round(percentile(values, 50), 6), "p95": round(percentile(values, 95), 6)}
+                for stage, values in self.samples.items() if values
+            }
+            record = {
+                "event": "summary", "elapsed": round(elapsed, 6), **self.totals,
+                "rows_per_sec": per_second(self.totals["rows"], elapsed),
+                "mb_per_sec": per_second(self.totals["bytes"] / 1024 / 1024, elapsed),
+                "stages": stages,
+            }
+            self.write(record)
+        return record
+
+## === Prometheus export === ##
+
+# Seconds buckets shared by the transfer and insert latency histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+registry = {}
+registry_lock = threading.Lock()
+
+def format_labels(labels):
+    # {name="value",...} with backslashes, quotes and newlines escaped, empty without labels
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+def format_value(value):
+    # Integral values print without a decimal point, others at full precision (timestamps)
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+class Metric:
+    # One metric family; values are kept per label set (a sorted tuple of (name, value) pairs)
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(labels)} {format_value(value)}"
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with registry_lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with registry_lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with registry_lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [n + (value <= bound) for n, bound in zip(counts, self.buckets)]
+            self.values[key] = (counts, total + value, count + 1)
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            for bound, n in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {n}"
+            yield f"{self.name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}"
+            yield f"{self.name}_sum{format_labels(labels)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(labels)} {count}"
+
+def get_metric(cls, name, help_text, **kwargs):
+    # Metrics are created on first use, so modules can declare the ones they touch
+    with registry_lock:
+        if name not in registry:
+            registry[name] = cls(name, help_text, **kwargs)
+        return registry[name]
+
+def counter(name, help_text):
+    return get_metric(Counter, name, help_text)
+
+def gauge(name, help_text):
+    return get_metric(Gauge, name, help_text)
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    return get_metric(Histogram, name, help_text, buckets=buckets)
+
+def exposition():
+    # Prometheus text format for every registered metric
+    with registry_lock:
+        metrics = sorted(registry.values(), key=lambda metric: metric.name)
+        lines = [line for metric in metrics for line in metric.lines()]
+    return "\n".join(lines) + "\n"
+
+def write_textfile(directory, name):
+    # <directory>/<name>.prom for node-exporter's textfile collector, renamed into place so
+    # the collector never reads a half-written file
+    path = os.path.join(directory, f"{name}.prom")
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+        f.write(exposition())
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+    return path
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise print a line to stderr every interval
+        pass
+
+def serve(port, host="127.0.0.1"):
+    # Serve /metrics from a daemon thread for long-running (watch) processes
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
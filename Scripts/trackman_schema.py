@@ -0,0 +1,196 @@
+## === trackman_schema === ##
+# Declared column types for Trackman play-by-play CSVs
+# Passed to pd.read_csv up front so no per-file type inference happens
+# Add a new version to SCHEMAS when Trackman changes the export layout
+
+CURRENT_VERSION = "v3"
+
+def column(dtype, nullable=True):
+    # Column spec: pandas dtype and whether blanks are expected
+    # Integer columns that may be blank use pandas' nullable Int types
+    if not nullable and dtype.startswith("Int"):
+        dtype = dtype.lower()
+    return {"dtype": dtype, "nullable": nullable}
+
+TEXT = "string"
+# Low-cardinality text (teams, pitch types, calls) is stored as categoricals
+CATEGORY = "category"
+# Measurements stay float64: float32 values widen to artifacts like 92.30000305 when written to SQL FLOAT
+MEASURE = "float64"
+
+V3_COLUMNS = {
+    # Game and pitch identity
+    "PitchNo": column("Int32", nullable=False),
+    "Date": column(TEXT, nullable=False),
+    "Time": column(TEXT),
+    "PAofInning": column("Int16"),
+    "PitchofPA": column("Int16"),
+    "GameID": column(TEXT, nullable=False),
+    "PitchUID": column(TEXT),
+    "GameUID": column(TEXT),
+    "PlayID": column(TEXT),
+    "UTCDate": column(TEXT),
+    "UTCTime": column(TEXT),
+    "LocalDateTime": column(TEXT),
+    "UTCDateTime": column(TEXT),
+    "HomeTeamForeignID": column(TEXT),
+    "AwayTeamForeignID": column(TEXT),
+    "GameForeignID": column(TEXT),
+    "Notes": column(TEXT),
+
+    # Players and teams
+    "Pitcher": column(CATEGORY),
+    "PitcherId": column("Int64"),
+    "PitcherThrows": column(CATEGORY),
+    "PitcherTeam": column(CATEGORY),
+    "PitcherSet": column(CATEGORY),
+    "Batter": column(CATEGORY),
+    "BatterId": column("Int64"),
+    "BatterSide": column(CATEGORY),
+    "BatterTeam": column(CATEGORY),
+    "Catcher": column(CATEGORY),
+    "CatcherId": column("Int64"),
+    "CatcherThrows": column(CATEGORY),
+    "CatcherTeam": column(CATEGORY),
+    "HomeTeam": column(CATEGORY),
+    "AwayTeam": column(CATEGORY),
+    "Stadium": column(CATEGORY),
+    "Level": column(CATEGORY, nullable=False),
+    "League": column(CATEGORY),
+    "System": column(CATEGORY),
+
+    # Game state and pitch outcome
+    "Inning": column("Int16"),
+    "Top/Bottom": column(CATEGORY),
+    "Outs": column("Int16"),
+    "Balls": column("Int16"),
+    "Strikes": column("Int16"),
+    "TaggedPitchType": column(CATEGORY),
+    "AutoPitchType": column(CATEGORY),
+    "PitchCall": column(CATEGORY),
+    "KorBB": column(CATEGORY),
+    "TaggedHitType": column(CATEGORY),
+    "AutoHitType": column(CATEGORY),
+    "PlayResult": column(CATEGORY),
+    "OutsOnPlay": column("Int16"),
+    "RunsScored": column("Int16"),
+    "Tilt": column(CATEGORY),
+
+    # Release, movement and location
+    "RelSpeed": column(MEASURE),
+    "VertRelAngle": column(MEASURE),
+    "HorzRelAngle": column(MEASURE),
+    "SpinRate": column(MEASURE),
+    "SpinAxis": column(MEASURE),
+    "RelHeight": column(MEASURE),
+    "RelSide": column(MEASURE),
+    "Extension": column(MEASURE),
+    "VertBreak": column(MEASURE),
+    "InducedVertBreak": column(MEASURE),
+    "HorzBreak": column(MEASURE),
+    "PlateLocHeight": column(MEASURE),
+    "PlateLocSide": column(MEASURE),
+    "ZoneSpeed": column(MEASURE),
+    "VertApprAngle": column(MEASURE),
+    "HorzApprAngle": column(MEASURE),
+    "ZoneTime": column(MEASURE),
+    "EffectiveVelo": column(MEASURE),
+    "MaxHeight": column(MEASURE),
+    "MeasuredDuration": column(MEASURE),
+    "SpeedDrop": column(MEASURE),
+    "PitchLastMeasuredX": column(MEASURE),
+    "PitchLastMeasuredY": column(MEASURE),
+    "PitchLastMeasuredZ": column(MEASURE),
+    "pfxx": column(MEASURE),
+    "pfxz": column(MEASURE),
+    "x0": column(MEASURE),
+    "y0": column(MEASURE),
+    "z0": column(MEASURE),
+    "vx0": column(MEASURE),
+    "vy0": column(MEASURE),
+    "vz0": column(MEASURE),
+    "ax0": column(MEASURE),
+    "ay0": column(MEASURE),
+    "az0": column(MEASURE),
+
+    # Batted ball
+    "ExitSpeed": column(MEASURE),
+    "Angle": column(MEASURE),
+    "Direction": column(MEASURE),
+    "HitSpinRate": column(MEASURE),
+    "PositionAt110X": column(MEASURE),
+    "PositionAt110Y": column(MEASURE),
+    "PositionAt110Z": column(MEASURE),
+    "Distance": column(MEASURE),
+    "LastTrackedDistance": column(MEASURE),
+    "Bearing": column(MEASURE),
+    "HangTime": column(MEASURE),
+    "ContactPositionX": column(MEASURE),
+    "ContactPositionY": column(MEASURE),
+    "ContactPositionZ": column(MEASURE),
+    "HitSpinAxis": column(MEASURE),
+
+    # Catcher throws
+    "ThrowSpeed": column(MEASURE),
+    "PopTime": column(MEASURE),
+    "ExchangeTime": column(MEASURE),
+    "TimeToBase": column(MEASURE),
+    "CatchPositionX": column(MEASURE),
+    "CatchPositionY": column(MEASURE),
+    "CatchPositionZ": column(MEASURE),
+    "ThrowPositionX": column(MEASURE),
+    "ThrowPositionY": column(MEASURE),
+    "ThrowPositionZ": column(MEASURE),
+    "BasePositionX": column(MEASURE),
+    "BasePositionY": column(MEASURE),
+    "BasePositionZ": column(MEASURE),
+}
+
+# Families of numbered columns matched by prefix (e.g. PitchTrajectoryXc0..Zc2, HitTrajectoryXc0..Zc8)
+# and High/Medium/Low confidence ratings matched by suffix
+V3_PREFIXES = {
+    "PitchTrajectory": column(MEASURE),
+    "HitTrajectory": column(MEASURE),
+    "ThrowTrajectory": column(MEASURE),
+}
+V3_CATEGORY_SUFFIXES = ("Confidence",)
+
+SCHEMAS = {
+    "v3": {"columns": V3_COLUMNS, "prefixes": V3_PREFIXES, "category_suffixes": V3_CATEGORY_SUFFIXES},
+}
+
+def column_spec(name, version=CURRENT_VERSION):
+    # Declared spec for one column, or None for columns the schema doesn't know
+    schema = SCHEMAS[version]
+    if name in schema["columns"]:
+        return schema["columns"][name]
+    for prefix, spec in schema["prefixes"].items():
+        if name.startswith(prefix):
+            return spec
+    if name.endswith(schema["category_suffixes"]):
+        return column(CATEGORY)
+    return None
+
+def read_dtypes(header, version=CURRENT_VERSION):
+    # dtype mapping for pd.read_csv covering every declared column in a file's header
+    # Columns the schema doesn't know are left to pandas' inference
+    dtypes = {}
+    for name in header:
+        spec = column_spec(name, version)
+        if spec is not None:
+            dtypes[name] = spec["dtype"]
+    return dtypes
+
+def arrow_types(header, version=CURRENT_VERSION):
+    # Same declared types as pyarrow types, for pyarrow.csv ConvertOptions(column_types=...)
+    # pyarrow is only needed by the Arrow reader engines, so it is imported here
+    import pyarrow as pa
+    arrow_dtypes = {
+        TEXT: pa.string(),
+        CATEGORY: pa.dictionary(pa.int32(), pa.string()),
+        MEASURE: pa.float64(),
+        "Int16": pa.int16(), "int16": pa.int16(),
+        "Int32": pa.int32(), "int32": pa.int32(),
+        "Int64": pa.int64(), "int64": pa.int64(),
+    }
+    return {name: arrow_dtypes[dtype] for name, dtype in read_dtypes(header, version).items()}